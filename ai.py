@@ -0,0 +1,210 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the AIPlayer class, a perfect-play Tic-Tac-Toe opponent. Instead of searching the
+# game tree on every move, the whole game is solved once with negamax and the result is stored in a table with one
+# byte for every possible board, so choosing a move is a single lookup.
+#
+# A board is numbered by reading its cells as a base 3 number (empty = 0, X = 1, O = 2), which gives 3^9 = 19683
+# entries. Each entry holds the best move in its low 4 bits and the game value for the player to move in its high
+# bits. Unreachable boards are marked with UNREACHABLE. Positions that are rotations or reflections of each other
+# have the same value, so the solver only searches one position of each symmetry class.
+#
+# The table is written to a file the first time it is needed and memory-mapped afterwards, so every process that
+# uses the AI shares the same read-only pages.
+
+import mmap
+import os
+
+TABLE_SIZE = 3 ** 9
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tictactoe_ai.table')
+
+UNREACHABLE = 0xFF
+NO_MOVE = 0x0F  # Stored as the best move of finished games
+
+# Every way to get three in a row on the classic board, as a bitmask over the 9 cells (bit i is cell i)
+WINNING_MASKS = tuple(
+    sum(1 << index for index in combination)
+    for combination in (
+        (0, 1, 2), (3, 4, 5), (6, 7, 8),  # rows
+        (0, 3, 6), (1, 4, 7), (2, 5, 8),  # columns
+        (0, 4, 8), (2, 4, 6)  # diagonals
+    )
+)
+FULL_BOARD = (1 << 9) - 1
+
+# WINNING_BITBOARDS[bits] is True if a player owning the cells in bits has three in a row on the classic board
+WINNING_BITBOARDS = tuple(any(bits & mask == mask for mask in WINNING_MASKS) for bits in range(FULL_BOARD + 1))
+
+# Values of a position for the player to move
+LOSS = -1
+DRAW = 0
+WIN = 1
+
+# Base 3 value contributed by every combination of marked cells, for X (digit 1) and O (digit 2)
+X_INDEX = tuple(sum(3 ** i for i in range(9) if bits >> i & 1) for bits in range(FULL_BOARD + 1))
+O_INDEX = tuple(2 * index for index in X_INDEX)
+
+# The 8 symmetries of the board, as the cell each cell is moved to
+SYMMETRIES = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),  # identity
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),  # rotate 90
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),  # rotate 180
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),  # rotate 270
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),  # mirror left/right
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),  # mirror top/bottom
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),  # mirror main diagonal
+    (8, 5, 2, 7, 4, 1, 6, 3, 0),  # mirror anti-diagonal
+)
+
+# SYMMETRY_BITS[s][bits] is the bitboard bits transformed by symmetry s
+SYMMETRY_BITS = tuple(
+    tuple(sum(1 << symmetry[i] for i in range(9) if bits >> i & 1) for bits in range(FULL_BOARD + 1))
+    for symmetry in SYMMETRIES
+)
+
+
+def position_index(x_bits, o_bits):
+    """
+    Returns the table index of a board.
+
+    Parameters:
+        x_bits (int): The cells marked by 'X'.
+        o_bits (int): The cells marked by 'O'.
+
+    Returns:
+        int: The base 3 number of the board.
+    """
+    return X_INDEX[x_bits] + O_INDEX[o_bits]
+
+
+def canonical_position(x_bits, o_bits):
+    """
+    Returns the representative of a board's symmetry class.
+
+    Parameters:
+        x_bits (int): The cells marked by 'X'.
+        o_bits (int): The cells marked by 'O'.
+
+    Returns:
+        tuple: The smallest (x_bits, o_bits) among the 8 symmetric versions of the board.
+    """
+    return min((table[x_bits], table[o_bits]) for table in SYMMETRY_BITS)
+
+
+def solve():
+    """
+    Solves every reachable board.
+
+    Returns:
+        bytearray: The table of TABLE_SIZE entries described at the top of this file.
+    """
+    table = bytearray([UNREACHABLE]) * TABLE_SIZE
+    scores = {}  # Negamax score of each canonical position
+
+    def negamax(own, other):
+        # own is the player to move, other just moved. Quicker wins score higher.
+        empty_cells = 9 - bin(own | other).count('1')
+        if WINNING_BITBOARDS[other]:
+            return -(1 + empty_cells)
+        if own | other == FULL_BOARD:
+            return 0
+        key = canonical_position(own, other)
+        if key not in scores:
+            scores[key] = max(-negamax(other, own | 1 << i) for i in range(9) if not (own | other) >> i & 1)
+        return scores[key]
+
+    def fill(x_bits, o_bits):
+        index = position_index(x_bits, o_bits)
+        if table[index] != UNREACHABLE:
+            return
+
+        x_to_move = bin(x_bits).count('1') == bin(o_bits).count('1')
+        own, other = (x_bits, o_bits) if x_to_move else (o_bits, x_bits)
+        score = negamax(own, other)
+        value = WIN if score > 0 else LOSS if score < 0 else DRAW
+        if WINNING_BITBOARDS[other] or own | other == FULL_BOARD:
+            table[index] = (value + 1) << 4 | NO_MOVE
+            return
+
+        best_move, best_score = NO_MOVE, None
+        for i in range(9):
+            if (x_bits | o_bits) >> i & 1:
+                continue
+            child_score = -negamax(other, own | 1 << i)
+            if best_score is None or child_score > best_score:
+                best_move, best_score = i, child_score
+            if x_to_move:
+                fill(x_bits | 1 << i, o_bits)
+            else:
+                fill(x_bits, o_bits | 1 << i)
+        table[index] = (value + 1) << 4 | best_move
+
+    fill(0, 0)
+    return table
+
+
+class AIPlayer:
+    """
+        This class implements a perfect-play tic-tac-toe opponent backed by a precomputed table.
+
+        Attributes:
+            path (str): The file the table is stored in.
+            table (mmap.mmap): The memory-mapped table.
+
+        Methods:
+            choose_move(tictactoe: TicTacToe) -> int: Returns the best move for the player to move.
+            evaluate(tictactoe: TicTacToe) -> int: Returns the game value for the player to move.
+            close(): Unmaps the table.
+    """
+
+    def __init__(self, path=DEFAULT_TABLE_PATH):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) != TABLE_SIZE:
+            # Write to a temporary file first so other processes never map a half written table
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'wb') as table_file:
+                table_file.write(solve())
+            os.replace(temporary_path, path)
+
+        with open(path, 'rb') as table_file:
+            self.table = mmap.mmap(table_file.fileno(), TABLE_SIZE, access=mmap.ACCESS_READ)
+
+    def lookup(self, tictactoe):
+        """Returns the table entry of a game's board."""
+        if tictactoe.size != 3 or tictactoe.win_length != 3:
+            raise ValueError("The AI only plays on the classic 3x3 board")
+        entry = self.table[position_index(tictactoe.x_bits, tictactoe.o_bits)]
+        if entry == UNREACHABLE:
+            raise ValueError("Board cannot be reached in a game of tic-tac-toe")
+        return entry
+
+    def choose_move(self, tictactoe):
+        """
+        Returns the best move for the player to move.
+
+        Parameters:
+            tictactoe (TicTacToe): The game to move in.
+
+        Returns:
+            int: The index of the cell to mark, or None if the game is over.
+        """
+        best_move = self.lookup(tictactoe) & 0x0F
+        return None if best_move == NO_MOVE else best_move
+
+    def evaluate(self, tictactoe):
+        """
+        Returns the game value of a board under perfect play.
+
+        Parameters:
+            tictactoe (TicTacToe): The game to evaluate.
+
+        Returns:
+            int: WIN, DRAW or LOSS, for the player to move.
+        """
+        return (self.lookup(tictactoe) >> 4) - 1
+
+    def close(self):
+        """Unmaps the table."""
+        self.table.close()
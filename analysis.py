@@ -0,0 +1,283 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script solves every reachable position of a tic-tac-toe board offline and writes, for each of them,
+# its game value, its depth to the end of the game under perfect play and statistics about its moves. The tables are
+# meant for tuning bots on boards the AIPlayer does not cover.
+#
+# The search is the same negamax as ai.solve(), generalized to any size and win length: positions are bitboards,
+# a win is detected through the lines of the last marked cell, and positions that are rotations or reflections of each
+# other are solved once. The game tree is split into the subtrees of the openings a few plies deep, which are solved
+# in parallel by a ProcessPoolExecutor. Every worker keeps its memo between the subtrees it is given, so positions
+# shared by those subtrees are solved once per worker. The parent then solves the few positions above the split from
+# the workers' results.
+#
+# Results are streamed to a columnar file as each subtree finishes. The file starts with a header, followed by chunks:
+#
+#     header:  magic "TTTA" | version (1) | size (1) | win length (1)
+#     chunk:   row count (4) | x_bits column | o_bits column | value column | depth column | moves column | ...
+#
+# every column being row count little-endian values of the type listed in COLUMNS. Positions are stored in their
+# canonical (smallest symmetric) form, with the value for the player to move: 1 win, 0 draw, -1 loss.
+#
+# The classic 3x3 board takes a fraction of a second, 4x4 boards with 3 in a row take seconds, and boards of 4x4 with
+# 4 in a row and larger have millions of positions and take a long time and a lot of memory.
+
+import argparse
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tictactoe import winning_lines
+from transposition import canonical_bits
+
+FILE_HEADER = struct.Struct('<4sBBB')  # Magic, version, board size, win length
+CHUNK_HEADER = struct.Struct('<I')  # Row count
+MAGIC = b'TTTA'
+VERSION = 1
+
+# Name and array type code of every column, in the order they are stored
+COLUMNS = (
+    ('x_bits', 'Q'),
+    ('o_bits', 'Q'),
+    ('value', 'b'),  # For the player to move: 1 win, 0 draw, -1 loss
+    ('depth', 'B'),  # Moves left until the game ends under perfect play
+    ('moves', 'B'),  # Legal moves
+    ('winning_moves', 'B'),
+    ('drawing_moves', 'B'),
+    ('losing_moves', 'B'),
+)
+
+MAX_CELLS = 64  # Bitboards are stored in 64 bits
+
+# Negamax score of each canonical position solved by this process, kept between the subtrees a worker solves. It is
+# only valid for one board, so analyze() clears it in its own process and in every worker it starts.
+scores = {}
+
+
+def score_value(score):
+    """Returns the game value (1 win, 0 draw, -1 loss) of a negamax score."""
+    return (score > 0) - (score < 0)
+
+
+def solve_position(size, win_length, x_bits, o_bits, last, rows):
+    """
+    Solves a position and every position below it that has not been solved yet.
+
+    Parameters:
+        size (int): The number of rows and columns of the board.
+        win_length (int): How many marks in a row win the game.
+        x_bits (int): The cells marked by 'X'.
+        o_bits (int): The cells marked by 'O'.
+        last (int): The cell marked by the last move, None for the empty board.
+        rows (list): Receives a row of the COLUMNS for every position solved.
+
+    Returns:
+        int: The negamax score for the player to move. Quicker wins score higher, like in ai.solve().
+    """
+    key = canonical_bits(size, x_bits, o_bits)
+    score = scores.get(key)
+    if score is not None:
+        return score
+
+    cell_count = size * size
+    occupied = x_bits | o_bits
+    empty_cells = cell_count - bin(occupied).count('1')
+    x_to_move = empty_cells % 2 == cell_count % 2
+    other = o_bits if x_to_move else x_bits  # The player that just moved
+
+    moves = winning = drawing = losing = 0
+    if last is not None and any(other & mask == mask for mask in winning_lines(size, win_length)[last]):
+        score = -(1 + empty_cells)
+    elif empty_cells == 0:
+        score = 0
+    else:
+        score = None
+        for cell in range(cell_count):
+            if occupied >> cell & 1:
+                continue
+            if x_to_move:
+                child_score = -solve_position(size, win_length, x_bits | 1 << cell, o_bits, cell, rows)
+            else:
+                child_score = -solve_position(size, win_length, x_bits, o_bits | 1 << cell, cell, rows)
+            moves += 1
+            if child_score > 0:
+                winning += 1
+            elif child_score < 0:
+                losing += 1
+            else:
+                drawing += 1
+            if score is None or child_score > score:
+                score = child_score
+
+    scores[key] = score
+    # A win or loss ends with 1 + |score| empty cells left, a draw fills the board
+    depth = empty_cells - (abs(score) - 1) if score else empty_cells
+    rows.append(key + (score_value(score), depth, moves, winning, drawing, losing))
+    return score
+
+
+def solve_subtree(size, win_length, x_bits, o_bits, last):
+    """
+    Solves the subtree of an opening, in a worker process.
+
+    Returns:
+        list: A row for every position of the subtree this worker had not solved before.
+    """
+    rows = []
+    solve_position(size, win_length, x_bits, o_bits, last, rows)
+    return rows
+
+
+def openings(size, win_length, split_depth):
+    """
+    Returns the distinct positions split_depth moves into the game, up to symmetry, that are still being played.
+
+    Returns:
+        list: The (x_bits, o_bits, last) of each opening.
+    """
+    cell_count = size * size
+    lines = winning_lines(size, win_length)
+    frontier = {canonical_bits(size, 0, 0): (0, 0, None)}
+    for ply in range(split_depth):
+        next_frontier = {}
+        for x_bits, o_bits, last in frontier.values():
+            occupied = x_bits | o_bits
+            for cell in range(cell_count):
+                if occupied >> cell & 1:
+                    continue
+                if ply % 2 == 0:
+                    child = (x_bits | 1 << cell, o_bits, cell)
+                    mover = child[0]
+                else:
+                    child = (x_bits, o_bits | 1 << cell, cell)
+                    mover = child[1]
+                if any(mover & mask == mask for mask in lines[cell]):
+                    continue  # Game over, the parent solves it
+                next_frontier.setdefault(canonical_bits(size, child[0], child[1]), child)
+        frontier = next_frontier
+    return list(frontier.values())
+
+
+def write_chunk(analysis_file, rows):
+    """Writes rows to the analysis file as one chunk of columns."""
+    analysis_file.write(CHUNK_HEADER.pack(len(rows)))
+    for column, (_, type_code) in enumerate(COLUMNS):
+        values = array(type_code, (row[column] for row in rows))
+        if sys.byteorder == 'big':
+            values.byteswap()  # The file is little-endian
+        values.tofile(analysis_file)
+
+
+def analyze(path, size=3, win_length=3, workers=None, split_depth=2):
+    """
+    Solves every reachable position of a board and streams the results to a columnar file.
+
+    Parameters:
+        path (str): The file to write.
+        size (int): The number of rows and columns of the board.
+        win_length (int): How many marks in a row win the game.
+        workers (int): The number of worker processes, all cores by default.
+        split_depth (int): How many moves deep the game tree is split into subtrees for the workers.
+
+    Returns:
+        int: The number of positions written.
+    """
+    if size * size > MAX_CELLS:
+        raise ValueError(f"Boards larger than {MAX_CELLS} cells are not supported")
+    winning_lines(size, win_length)  # Validates the win length
+    split_depth = min(split_depth, size * size)
+    scores.clear()  # Left over from a previous analysis, possibly of another board
+    written = set()
+
+    def write_new(rows):
+        new_rows = [row for row in rows if row[:2] not in written]
+        written.update(row[:2] for row in new_rows)
+        if new_rows:
+            write_chunk(analysis_file, new_rows)
+
+    with open(path, 'wb') as analysis_file:
+        analysis_file.write(FILE_HEADER.pack(MAGIC, VERSION, size, win_length))
+        # Forked workers inherit this process's memo, clear it before they solve anything
+        with ProcessPoolExecutor(workers, initializer=scores.clear) as executor:
+            futures = [executor.submit(solve_subtree, size, win_length, *opening)
+                       for opening in openings(size, win_length, split_depth)]
+            for future in as_completed(futures):
+                rows = future.result()
+                write_new(rows)
+                # Seed this process's memo so the positions above the split are solved from the subtrees
+                for row in rows:
+                    scores[row[:2]] = subtree_score(size, row)
+
+        rows = []
+        solve_position(size, win_length, 0, 0, None, rows)
+        write_new(rows)
+    return len(written)
+
+
+def subtree_score(size, row):
+    """Rebuilds the negamax score of a position from its row."""
+    x_bits, o_bits, value, depth = row[:4]
+    empty_cells = size * size - bin(x_bits | o_bits).count('1')
+    return value * (1 + empty_cells - depth)
+
+
+def read_analysis(path):
+    """
+    Reads an analysis file.
+
+    Parameters:
+        path (str): The file written by analyze().
+
+    Returns:
+        tuple: The (size, win_length, columns) of the analysis, columns mapping each column name to an array.
+    """
+    with open(path, 'rb') as analysis_file:
+        magic, version, size, win_length = FILE_HEADER.unpack(analysis_file.read(FILE_HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an analysis file")
+        columns = {name: array(type_code) for name, type_code in COLUMNS}
+        while True:
+            header = analysis_file.read(CHUNK_HEADER.size)
+            if len(header) < CHUNK_HEADER.size:
+                break
+            row_count, = CHUNK_HEADER.unpack(header)
+            for name, type_code in COLUMNS:
+                values = array(type_code)
+                values.fromfile(analysis_file, row_count)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                columns[name].extend(values)
+    return size, win_length, columns
+
+
+def report(path):
+    """Prints a summary of an analysis file."""
+    size, win_length, columns = read_analysis(path)
+    values = columns['value']
+    print(f"{size}x{size} board, {win_length} in a row: {len(values)} positions up to symmetry")
+    print(f"Wins for the player to move: {values.count(1)}, draws: {values.count(0)}, losses: {values.count(-1)}")
+    for index in range(len(values)):
+        if columns['x_bits'][index] == 0 and columns['o_bits'][index] == 0:
+            value = {1: "X wins", 0: "draw", -1: "O wins"}[values[index]]
+            print(f"Empty board: {value} in {columns['depth'][index]} moves with perfect play")
+    print(f"Longest game under perfect play: {max(columns['depth'])} moves")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve every position of a tic-tac-toe board.")
+    parser.add_argument('--size', type=int, default=3, help="number of rows and columns of the board")
+    parser.add_argument('--win-length', type=int, default=3, help="how many marks in a row win a game")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--split-depth', type=int, default=2, help="moves deep to split the game tree for the workers")
+    parser.add_argument('--output', default=None, help="file to write, analysis-SIZExSIZE-WIN.ttta by default")
+    args = parser.parse_args()
+
+    output = args.output or f"analysis-{args.size}x{args.size}-{args.win_length}.ttta"
+    start = time.perf_counter()
+    count = analyze(output, args.size, args.win_length, args.workers, args.split_depth)
+    print(f"Solved {count} positions in {time.perf_counter() - start:.2f}s, written to {output}")
+    report(output)
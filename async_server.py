@@ -0,0 +1,738 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the AsyncServer class, an asyncio based alternative to the Server class that
+# hosts many Tic-Tac-Toe games at once in a single process. Each connected client is handled by its own coroutine,
+# and clients that type 'play tictactoe' are placed in a lobby and paired with the next waiting client.
+#
+# Each pairing is driven by a GameSession coroutine. The server acts as the referee: it keeps the authoritative
+# TicTacToe board, validates every move it receives and relays it to the opponent. Messages are framed with the
+# protocol module, the same way client.py frames them, so the existing Client can be used unchanged against this server.
+#
+# Clients that type 'watch <game id>' become spectators of a game in progress: they receive a snapshot of the board,
+# then every move as it is played, through the game's Broadcast.
+#
+# Every player has a clock: a player that does not move within the turn timeout forfeits the game, and a connection
+# that sends nothing for the idle timeout outside of a game is closed. Both clocks run on one TimerWheel. Connections
+# over max_connections are rejected as soon as they are accepted.
+#
+# Started with --ai, the server pairs every player with the perfect-play AIPlayer instead of another client.
+# Started with --metrics, it serves its Metrics on http://localhost:9100/metrics.
+# Started with --journal, it records every game in games.journal (see journal.py). Moves are committed to disk in
+# groups every commit interval, and games left unfinished by a crash are closed as aborted on the next start.
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from tictactoe import TicTacToe
+from metrics import Metrics, profiled
+from broadcast import Broadcast
+from timerwheel import TimerWheel
+from journal import JournalReader, JournalWriter, RECORD, RESULT_DRAW, RESULT_X_WON, RESULT_O_WON, RESULT_ABORTED
+from protocol import (FrameDecoder, ProtocolError, encode_frame, encode_move, decode_move, encode_instructions,
+                      decode_instructions, MSG_TEXT, MSG_QUIT, MSG_INSTRUCTIONS,
+                      MSG_STATE, MSG_MOVE, MSG_RESYNC, PLAY_REQUEST, STATUS_ONGOING, STATUS_WIN, STATUS_DRAW)
+
+# Journal result of each final game status returned by GameSession.run()
+JOURNAL_RESULTS = {
+    "draw": RESULT_DRAW,
+    "X won": RESULT_X_WON,
+    "O won": RESULT_O_WON,
+    "X won by forfeit": RESULT_X_WON,
+    "O won by forfeit": RESULT_O_WON,
+}
+
+
+class Player:
+    """
+        This class represents a client connected to the AsyncServer.
+
+        Attributes:
+            reader (asyncio.StreamReader): Stream used to receive messages from the client.
+            writer (asyncio.StreamWriter): Stream used to send messages to the client.
+            address (tuple): The address of the connected client.
+            decoder (FrameDecoder): Reassembles frames from received bytes.
+            pending (deque): Messages already decoded but not yet returned by receive().
+            metrics (Metrics): Counts messages and bytes and times sends, None to skip instrumentation.
+            game_over (asyncio.Future): Resolved by the GameSession when the client's current game ends.
+            idle_timer (Timer): Closes the connection if the client stays idle, None while the client is playing.
+            lobby_read (asyncio.Task): Reads from the client while it waits in the lobby, None the rest of the time.
+    """
+
+    def __init__(self, reader, writer, metrics=None):
+        self.reader = reader
+        self.writer = writer
+        self.address = writer.get_extra_info('peername')
+        self.decoder = FrameDecoder()
+        self.pending = deque()
+        self.metrics = metrics
+        self.game_over = None
+        self.idle_timer = None
+        self.lobby_read = None
+
+    async def send(self, msg_type, text=''):
+        """Sends a text message to the client."""
+        await self.send_payload(msg_type, text.encode())
+
+    async def send_payload(self, msg_type, payload):
+        """Sends a message with an already encoded payload to the client."""
+        frame = encode_frame(msg_type, payload)
+        if self.metrics is None:
+            self.writer.write(frame)
+            await self.writer.drain()
+            return
+        start = time.perf_counter()
+        self.writer.write(frame)
+        await self.writer.drain()
+        self.metrics.observe('send', time.perf_counter() - start)
+        self.metrics.increment('messages_out')
+        self.metrics.increment('bytes_out', len(frame))
+
+    async def receive(self):
+        """
+        Waits for the next whole message from the client.
+
+        Returns:
+            tuple: The (msg_type, payload) of the message, or (None, b'') if the client disconnected.
+        """
+        while not self.pending:
+            data = await self.reader.read(4096)
+            if not data:
+                return None, b''
+            messages = self.decoder.feed(data)
+            self.pending.extend(messages)
+            if self.metrics is not None:
+                self.metrics.increment('bytes_in', len(data))
+                self.metrics.increment('messages_in', len(messages))
+        return self.pending.popleft()
+
+    def disconnect(self, message):
+        """Tells the client why it is being disconnected and closes the connection, without waiting."""
+        if not self.writer.is_closing():
+            self.writer.write(encode_frame(MSG_TEXT, message.encode()))
+            self.writer.close()
+
+
+class GameSession:
+    """
+        This class drives a single game of tic-tac-toe between two paired players.
+
+        Attributes:
+            session_id (int): Identifier of the session on the server.
+            players (dict): Maps each board character ('X' or 'O') to its Player.
+            tictactoe (TicTacToe): The authoritative game board.
+            metrics (Metrics): Counts invalid moves and times move validation.
+            journal (JournalWriter): Records every valid move, None to skip journaling.
+            broadcast (Broadcast): Streams every valid move to the spectators of the game.
+            timers (TimerWheel): Runs the turn clock, None to let players take as long as they like.
+            turn_timeout (float): Seconds a player has to move before forfeiting the game.
+            task (asyncio.Task): The task running the session, cancelled when a player runs out of time.
+            timed_out (str): The character of the player that ran out of time, None while both are in time.
+
+        Methods:
+            run() -> str: Plays the game to completion and returns the final game status.
+    """
+
+    def __init__(self, session_id, player_x, player_o, board_size=3, win_length=3, metrics=None, journal=None,
+                 timers=None, turn_timeout=60.0):
+        self.session_id = session_id
+        self.players = {"X": player_x, "O": player_o}
+        self.tictactoe = TicTacToe(board_size, win_length)
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.journal = journal
+        self.broadcast = Broadcast(self.tictactoe, metrics=self.metrics)
+        self.timers = timers
+        self.turn_timeout = turn_timeout
+        self.task = None
+        self.timed_out = None
+
+    async def run(self):
+        """
+        Plays the game to completion.
+
+        Returns:
+            str: The final status of the game, from the point of view of the server.
+        """
+        player_x = self.players["X"]
+        player_o = self.players["O"]
+
+        # The client that receives 'play tictactoe' answers with the instructions and waits for a move,
+        # the client that receives the instructions moves first.
+        await player_o.send_payload(MSG_TEXT, PLAY_REQUEST)
+        turn_clock = self.start_turn_clock("O")
+        try:
+            msg_type, payload = await player_o.receive()
+        except asyncio.CancelledError:
+            if self.timed_out != "O":
+                raise
+            msg_type, payload = None, b''
+        finally:
+            if turn_clock is not None:
+                turn_clock.cancel()
+        if msg_type != MSG_INSTRUCTIONS:
+            await self.abort(player_x, "Opponent disconnected before the game started.")
+            return "aborted"
+        board_size, win_length, _ = decode_instructions(payload)
+        if (board_size, win_length) != (self.tictactoe.size, self.tictactoe.win_length):
+            message = f"This server plays {self.tictactoe.win_length} in a row on a {self.tictactoe.size}x" \
+                      f"{self.tictactoe.size} board."
+            await self.abort(player_o, message)
+            await self.abort(player_x, "Opponent is playing on a different board.")
+            return "aborted"
+        await player_x.send_payload(MSG_INSTRUCTIONS, encode_instructions(board_size, win_length))
+
+        mover, opponent = "X", "O"
+        while True:
+            game_status, payload = await self.receive_move(mover)
+            if game_status is None:
+                reason = "ran out of time" if self.timed_out == mover else "left the game"
+                await self.abort(self.players[opponent], f"Player {mover} {reason}. You win!")
+                return f"{opponent} won by forfeit"
+
+            # The move is valid, so its encoded payload can be relayed to the opponent and spectators as is
+            self.broadcast.publish_move(payload)
+            await self.players[opponent].send_payload(MSG_MOVE, payload)
+            if game_status != "ongoing":
+                # The mover already knows the result, release it from waiting on a reply
+                await self.players[mover].send(MSG_TEXT, f"Game over: {game_status}")
+                return game_status
+
+            mover, opponent = opponent, mover
+
+    async def receive_move(self, player):
+        """
+        Waits for a valid move from a player and applies it to the authoritative board.
+
+        Parameters:
+            player (str): The character of the player to move.
+
+        Returns:
+            tuple: The game status after the move and the encoded move, or (None, b'') if the player left or ran out
+                of time.
+        """
+        turn_clock = self.start_turn_clock(player)
+        try:
+            while True:
+                msg_type, payload = await self.players[player].receive()
+                if msg_type is None or msg_type == MSG_QUIT:
+                    return None, b''
+
+                # Player lost track of the board: send the authoritative board and wait for the player to move again
+                if msg_type == MSG_RESYNC:
+                    await self.send_state(player)
+                    continue
+                # Anything other than a move, such as the text the Client sends when its user quits, leaves the game
+                if msg_type != MSG_MOVE:
+                    return None, b''
+                index, move_status = decode_move(payload)
+                game_status = self.replay_move(index, move_status, player)
+                if game_status is None:
+                    self.metrics.increment('invalid_moves')
+                    await self.send_state(player)
+                    continue
+                return game_status, payload
+        except asyncio.CancelledError:
+            if self.timed_out != player:
+                raise  # The server is shutting down
+            return None, b''
+        finally:
+            if turn_clock is not None:
+                turn_clock.cancel()
+
+    def start_turn_clock(self, player):
+        """Starts the clock of a player's turn, returning its Timer, or None if turns are not timed."""
+        if self.timers is None or self.task is None:
+            return None
+        return self.timers.schedule(self.turn_timeout, self.time_out, player)
+
+    def time_out(self, player):
+        """Forfeits the game of a player whose turn clock ran out, by interrupting the wait for its move."""
+        self.timed_out = player
+        self.metrics.increment('turn_timeouts')
+        self.players[player].disconnect("You ran out of time and lost the game.")
+        self.task.cancel()
+
+    def replay_move(self, index, move_status, player):
+        """
+        Applies a move received from a player to the authoritative board.
+
+        Parameters:
+            index (int): The index of the cell the player marked.
+            move_status (int): The game status the player reported after its move.
+            player (str): The character of the player that moved.
+
+        Returns:
+            str: The game status after the move, or None if the move is invalid or the reported status is wrong.
+        """
+        if not 0 <= index < self.tictactoe.cell_count:
+            return None
+        start = time.perf_counter()
+        valid_move = self.tictactoe.move(index, player)
+        self.metrics.observe('move', time.perf_counter() - start)
+        if not valid_move:
+            return None
+
+        if self.tictactoe.check_winner(player):
+            game_status, expected_status = f"{player} won", STATUS_WIN
+        elif self.tictactoe.check_draw():
+            game_status, expected_status = "draw", STATUS_DRAW
+        else:
+            game_status, expected_status = "ongoing", STATUS_ONGOING
+        if move_status != expected_status:
+            # Reported status disagrees with the board, undo the move so the player can resend it
+            self.tictactoe.board = [' ' if i == index else cell for i, cell in enumerate(self.tictactoe.board)]
+            return None
+        if self.journal is not None:
+            self.journal.move(self.session_id, index, player)
+        return game_status
+
+    async def send_state(self, player):
+        """Sends the full game state to a player, with the characters given from that player's point of view."""
+        tictactoe_data = {
+            "server character": "O" if player == "X" else "X",
+            "client character": player,
+            "board": self.tictactoe.board,
+            "game status": "ongoing"
+        }
+        start = time.perf_counter()
+        json_tictactoe_data = json.dumps(tictactoe_data)
+        self.metrics.observe('json_dumps', time.perf_counter() - start)
+        await self.players[player].send(MSG_STATE, json_tictactoe_data)
+
+    async def abort(self, player, message):
+        """Tells a player that the game ended early, ignoring players that are already gone."""
+        try:
+            await player.send(MSG_TEXT, message)
+        except ConnectionError:
+            pass
+
+
+class AIGameSession(GameSession):
+    """
+        This class drives a single game of tic-tac-toe between a player and the AI.
+        The player is 'X' and moves first, the AI plays 'O'.
+
+        Attributes:
+            ai (AIPlayer): Chooses the AI's moves.
+    """
+
+    def __init__(self, session_id, player, ai, metrics=None, journal=None, timers=None, turn_timeout=60.0):
+        super().__init__(session_id, player, None, metrics=metrics, journal=journal, timers=timers,
+                         turn_timeout=turn_timeout)
+        self.ai = ai
+
+    async def run(self):
+        """
+        Plays the game to completion.
+
+        Returns:
+            str: The final status of the game, from the point of view of the server.
+        """
+        player = self.players["X"]
+        await player.send_payload(MSG_INSTRUCTIONS, encode_instructions(3, 3))
+
+        while True:
+            game_status, payload = await self.receive_move("X")
+            if game_status is None:
+                return "O won by forfeit"
+            self.broadcast.publish_move(payload)
+            if game_status != "ongoing":
+                await player.send(MSG_TEXT, f"Game over: {game_status}")
+                return game_status
+
+            index = self.ai.choose_move(self.tictactoe)
+            self.tictactoe.move(index, "O")
+            if self.journal is not None:
+                self.journal.move(self.session_id, index, "O")
+            move_status = STATUS_ONGOING
+            if self.tictactoe.check_winner("O"):
+                game_status, move_status = "O won", STATUS_WIN
+            elif self.tictactoe.check_draw():
+                game_status, move_status = "draw", STATUS_DRAW
+
+            payload = encode_move(index, move_status)
+            self.broadcast.publish_move(payload)
+            await player.send_payload(MSG_MOVE, payload)
+            if game_status != "ongoing":
+                return game_status
+
+
+class AsyncServer:
+    """
+        This class implements an asyncio server that hosts many tic-tac-toe games concurrently.
+
+        Attributes:
+            host (str): The host name/IP address on which the server is running.
+            port (int): The port number on which the server is listening.
+            backlog (int): The maximum number of queued connections.
+            lobby (deque): Players waiting to be paired with an opponent.
+            sessions (dict): The game sessions currently in progress, by session id.
+            clients (dict): The Player served by each client handler task still running.
+            ai (AIPlayer): Opponent for every player when running in AI mode, None when players are paired.
+            board_size (int): The number of rows and columns of the board.
+            win_length (int): How many marks in a row win a game.
+            metrics (Metrics): Counters, gauges and latency histograms of the server.
+            reuse_port (bool): Bind with SO_REUSEPORT so several processes can share the port.
+            shutdown_timeout (float): Seconds to let games in progress finish after a shutdown is requested.
+            journal_path (str): The file every game is recorded in, None to run without a journal.
+            commit_interval (float): Seconds between two commits of the journal.
+            journal (JournalWriter): Records every game while the server is running.
+            turn_timeout (float): Seconds a player has to move before forfeiting the game.
+            idle_timeout (float): Seconds a connection may stay idle outside of a game before it is closed.
+            max_connections (int): Connections accepted beyond this number are rejected right away.
+            timers (TimerWheel): Runs the turn and idle clocks of every connection.
+
+        Methods:
+            start_server(): Starts the server and serves clients until interrupted.
+            serve(): Coroutine that accepts connections and serves clients until stopped.
+            stop(): Asks the server to shut down gracefully.
+            close_clients(): Coroutine that disconnects every client still connected during a shutdown.
+            open_journal(): Closes the games a crash left unfinished, then opens the journal for appending.
+            commit_journal(): Coroutine that commits the journal every commit interval.
+            run_timers(): Coroutine that advances the timer wheel once per tick.
+    """
+
+    def __init__(self, host='localhost', port=2000, backlog=1024, ai=False, board_size=3, win_length=3,
+                 metrics_port=None, reuse_port=False, shutdown_timeout=10.0, journal_path=None, commit_interval=0.05,
+                 turn_timeout=60.0, idle_timeout=300.0, max_connections=10000, timer_tick=1.0):
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.lobby = deque()
+        self.sessions = {}
+        self.clients = {}
+        self.next_session_id = 1
+        self.board_size = board_size
+        self.win_length = win_length
+        if ai and (board_size, win_length) != (3, 3):
+            raise ValueError("The AI only plays on the classic 3x3 board")
+        self.ai = None
+        if ai:
+            from ai import AIPlayer  # Loads the AI's tables, only servers that play against the AI need them
+            self.ai = AIPlayer()
+        self.connection_count = 0
+        self.metrics = Metrics()
+        self.metrics.gauge('active_sessions', lambda: len(self.sessions))
+        self.metrics.gauge('active_connections', lambda: self.connection_count)
+        self.metrics.gauge('lobby_players', lambda: len(self.lobby))
+        self.metrics.gauge('spectators', lambda: sum(len(s.broadcast.subscribers) for s in self.sessions.values()))
+        self.metrics_port = metrics_port
+        self.reuse_port = reuse_port
+        self.shutdown_timeout = shutdown_timeout
+        self.stopping = None
+        self.journal_path = journal_path
+        self.commit_interval = commit_interval
+        self.journal = None
+        # A single thread, so commits reach the file in the order they were taken
+        self.journal_executor = ThreadPoolExecutor(max_workers=1)
+        self.turn_timeout = turn_timeout
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        # One slot per tick of the longest timeout, so no timer ever waits more than one turn of the wheel
+        self.timers = TimerWheel(timer_tick, int(max(turn_timeout, idle_timeout) / timer_tick) + 2)
+
+    def start_server(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("Server has been stopped.")
+
+    async def serve(self):
+        if self.metrics_port is not None:
+            # Served from a thread, but every request reads the metrics on this event loop
+            self.metrics.start_http_server(self.host, self.metrics_port, asyncio.get_running_loop())
+        journal_task = None
+        if self.journal_path is not None:
+            self.open_journal()
+            journal_task = asyncio.create_task(self.commit_journal())
+        timers_task = asyncio.create_task(self.run_timers())
+        server = await asyncio.start_server(self.handle_client, self.host, self.port, backlog=self.backlog,
+                                            reuse_port=self.reuse_port or None)
+        print(f"Server is listening on: {self.host} on port: {self.port}")
+
+        loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        # Ctrl+C shuts down gracefully like SIGTERM, so the journal is committed and closed, unless it is ignored as
+        # in the launcher's workers
+        signals = [signal.SIGTERM]
+        if signal.getsignal(signal.SIGINT) is not signal.SIG_IGN:
+            signals.append(signal.SIGINT)
+        for signum in signals:
+            loop.add_signal_handler(signum, self.stop)
+        await self.stopping.wait()
+
+        # Stop accepting connections, then give the games in progress a chance to finish
+        server.close()
+        print(f"Server is shutting down, waiting for {len(self.sessions)} games to finish")
+        deadline = loop.time() + self.shutdown_timeout
+        while self.sessions and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        await self.close_clients()
+        for signum in signals:
+            loop.remove_signal_handler(signum)
+        timers_task.cancel()
+
+        if journal_task is not None:
+            # Games cut short by the shutdown have been recorded as aborted, commit them before closing
+            journal_task.cancel()
+            await asyncio.gather(journal_task, return_exceptions=True)
+            await loop.run_in_executor(self.journal_executor, self.journal.close)
+
+    def stop(self):
+        """Asks the server to stop accepting connections and shut down once its games have finished."""
+        if self.stopping is not None:
+            self.stopping.set()
+
+    async def close_clients(self):
+        """Tells every client still connected that the server is quitting, and waits for their handlers to finish."""
+        tasks = list(self.clients)
+        for player in self.clients.values():
+            if not player.writer.is_closing():
+                player.writer.write(encode_frame(MSG_QUIT))
+                player.writer.close()
+        # Idle clients stop on their own once their connection is closed, the ones waiting in the lobby, watching
+        # or still playing are interrupted
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def open_journal(self):
+        """Closes the games a crash left unfinished, then opens the journal for appending."""
+        unfinished = {}
+        if os.path.exists(self.journal_path):
+            reader = JournalReader(self.journal_path)
+            unfinished = reader.unfinished_sessions()
+            self.next_session_id = reader.max_session_id() + 1  # Session ids stay unique across restarts
+            reader.close()
+            # Drop a record torn by the crash, so new records are appended on a record boundary
+            if os.path.getsize(self.journal_path) != reader.record_count * RECORD.size:
+                os.truncate(self.journal_path, reader.record_count * RECORD.size)
+
+        self.journal = JournalWriter(self.journal_path)
+        for session_id in unfinished:
+            self.journal.end(session_id, RESULT_ABORTED)
+        self.journal.commit()
+        if unfinished:
+            print(f"Closed {len(unfinished)} unfinished games found in {self.journal_path}")
+
+    async def commit_journal(self):
+        """Commits the journal every commit interval, so moves reach the disk in groups instead of one at a time."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.commit_interval)
+            start = time.perf_counter()
+            await loop.run_in_executor(self.journal_executor, self.journal.write, self.journal.take_pending())
+            self.metrics.observe('journal_commit', time.perf_counter() - start)
+
+    async def run_timers(self):
+        """Advances the timer wheel once per tick, catching up on ticks missed while the event loop was busy."""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += self.timers.tick
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            self.timers.advance()
+
+    def start_idle_clock(self, player):
+        """Starts or restarts the clock that closes a player's connection once it has been idle too long."""
+        if player.idle_timer is not None:
+            player.idle_timer.cancel()
+        player.idle_timer = self.timers.schedule(self.idle_timeout, self.disconnect_idle, player)
+
+    def stop_idle_clock(self, player):
+        """Stops a player's idle clock, while it is playing or watching a game."""
+        if player.idle_timer is not None:
+            player.idle_timer.cancel()
+            player.idle_timer = None
+
+    def disconnect_idle(self, player):
+        """Closes the connection of a player that has been idle for too long, releasing it from the lobby."""
+        player.idle_timer = None
+        self.metrics.increment('idle_disconnects')
+        if player in self.lobby:
+            self.lobby.remove(player)
+        player.disconnect(f"Disconnected after {self.idle_timeout:g} seconds of inactivity.")
+        if player.game_over is not None and not player.game_over.done():
+            player.game_over.set_result(None)
+
+    async def handle_client(self, reader, writer):
+        """Serves a single connected client until it quits or disconnects."""
+        if self.connection_count >= self.max_connections:
+            # Reject before allocating anything for the connection
+            self.metrics.increment('rejected_connections')
+            writer.write(encode_frame(MSG_TEXT, b"The server is full, please try again later."))
+            writer.close()
+            return
+
+        player = Player(reader, writer, self.metrics)
+        self.clients[asyncio.current_task()] = player
+        self.connection_count += 1
+        self.metrics.increment('connections')
+        print(f"Connected by {player.address}")
+        try:
+            while True:
+                self.start_idle_clock(player)
+                msg_type, payload = await player.receive()
+                if msg_type is None or msg_type == MSG_QUIT:
+                    break
+
+                if msg_type == MSG_TEXT and payload == PLAY_REQUEST:
+                    await self.join_game(player)
+                elif msg_type == MSG_TEXT and payload.startswith(b'watch'):
+                    await self.watch_game(player, payload[len(b'watch'):].strip())
+                else:
+                    await player.send(MSG_TEXT, "Type 'play tictactoe' to be matched with an opponent, "
+                                                "'watch <game id>' to watch a game, or /q to quit")
+        except ConnectionError as e:
+            print(f"Connection to {player.address} lost: {e}")
+        except ProtocolError as e:
+            self.metrics.increment('decode_errors')
+            print(f"Received invalid data from {player.address}: {e}")
+        except asyncio.CancelledError:
+            if self.stopping is None or not self.stopping.is_set():
+                raise  # Only close_clients() may interrupt a client, during a shutdown
+        finally:
+            del self.clients[asyncio.current_task()]
+            self.connection_count -= 1
+            self.stop_idle_clock(player)
+            if player in self.lobby:
+                self.lobby.remove(player)
+            writer.close()
+            print(f"Disconnected from {player.address}")
+
+    async def join_game(self, player):
+        """Pairs a player with a waiting opponent, or waits in the lobby until one arrives, then plays the game."""
+        player.game_over = asyncio.get_running_loop().create_future()
+        if self.ai:
+            self.stop_idle_clock(player)
+            await self.play_game(AIGameSession(self.new_session_id(), player, self.ai, self.metrics, self.journal,
+                                               self.timers, self.turn_timeout))
+            return
+
+        # Skip waiting players whose connection has since closed
+        while self.lobby and (self.lobby[0].writer.is_closing() or self.lobby[0].reader.at_eof()):
+            self.lobby.popleft()
+
+        if not self.lobby:
+            self.lobby.append(player)  # Its idle clock keeps running until an opponent arrives
+            await self.wait_in_lobby(player)
+            await player.game_over
+            return
+
+        opponent = self.lobby.popleft()
+        if opponent.lobby_read is not None:
+            opponent.lobby_read.cancel()  # The game reads from it from now on
+        self.stop_idle_clock(opponent)
+        self.stop_idle_clock(player)
+        session = GameSession(self.new_session_id(), opponent, player, self.board_size, self.win_length, self.metrics,
+                              self.journal, self.timers, self.turn_timeout)
+        await self.play_game(session)
+
+    async def wait_in_lobby(self, player):
+        """
+        Reads from a player waiting in the lobby until it is paired, so a player that disconnects or quits meanwhile
+        leaves the lobby instead of being paired with the next player.
+        """
+        while player in self.lobby:
+            player.lobby_read = asyncio.ensure_future(player.receive())
+            await asyncio.wait((player.lobby_read, player.game_over), return_when=asyncio.FIRST_COMPLETED)
+            read, player.lobby_read = player.lobby_read, None
+            if not read.done():
+                read.cancel()  # Disconnected while idle
+                return
+            if read.cancelled():
+                return  # Paired with an opponent
+            if player not in self.lobby:
+                # Paired after the read completed, leave the message for the game
+                if read.exception() is None:
+                    player.pending.appendleft(read.result())
+                return
+
+            msg_type, payload = read.result()
+            if msg_type is None or msg_type == MSG_QUIT:
+                self.lobby.remove(player)
+                player.pending.appendleft((msg_type, payload))  # Ends the connection once back in handle_client()
+                player.game_over.set_result(None)
+                return
+            await player.send(MSG_TEXT, "Waiting for an opponent, type /q to quit")
+
+    async def watch_game(self, player, session_id):
+        """Streams a game in progress to a spectator until the game ends or the spectator is dropped."""
+        session = self.sessions.get(int(session_id)) if session_id.isdigit() else None
+        if session is None:
+            games = ', '.join(str(session_id) for session_id in islice(self.sessions, 10)) or "none"
+            await player.send(MSG_TEXT, f"No game with that id is in progress. Games in progress: {games}")
+            return
+
+        self.stop_idle_clock(player)
+        subscriber = session.broadcast.subscribe(player.writer)
+        self.metrics.increment('spectators_joined')
+        try:
+            await subscriber.run()
+        finally:
+            session.broadcast.unsubscribe(subscriber)
+
+    def new_session_id(self):
+        """Returns an unused session id."""
+        session_id = self.next_session_id
+        self.next_session_id += 1
+        return session_id
+
+    async def play_game(self, session):
+        """Runs a game session and releases its players when it ends."""
+        session_id = session.session_id
+        session.task = asyncio.current_task()  # Cancelled by the turn clock when a player runs out of time
+        self.sessions[session_id] = session
+        self.metrics.increment('sessions')
+        # Profile the session if it was requested through the metrics endpoint
+        profiler = None
+        if self.metrics.take_profile_request():
+            import cProfile
+            profiler = cProfile.Profile()
+        if self.journal is not None:
+            self.journal.start(session_id, session.tictactoe.size, session.tictactoe.win_length)
+        game_status = "aborted"
+        completed = False
+        try:
+            if profiler is None:
+                game_status = await session.run()
+            else:
+                game_status = await profiled(session.run(), profiler)
+            completed = True
+            print(f"Session {session_id} finished: {game_status}")
+        except ConnectionError as e:
+            print(f"Session {session_id} ended with a connection error: {e}")
+        except ProtocolError as e:
+            self.metrics.increment('decode_errors')
+            print(f"Session {session_id} received invalid data: {e}")
+        except Exception as e:
+            self.metrics.increment('errors')
+            print(f"Session {session_id} failed: {type(e).__name__}: {e}")
+        finally:
+            del self.sessions[session_id]
+            session.broadcast.close(game_status)
+            if self.journal is not None:
+                self.journal.end(session_id, JOURNAL_RESULTS.get(game_status, RESULT_ABORTED))
+            if profiler is not None:
+                profiler.dump_stats(self.metrics.profile_path(session_id))
+            if not completed:
+                # The session failed before telling the players, so the one waiting for a move would wait forever
+                for player in session.players.values():
+                    if player is not None and not player.writer.is_closing():
+                        await session.abort(player, "The game ended because of an error.")
+            for finished in session.players.values():
+                if finished is not None and not finished.game_over.done():
+                    finished.game_over.set_result(None)
+
+
+if __name__ == "__main__":
+    server = AsyncServer(ai='--ai' in sys.argv, metrics_port=9100 if '--metrics' in sys.argv else None,
+                         journal_path='games.journal' if '--journal' in sys.argv else None)
+    server.start_server()
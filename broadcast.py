@@ -0,0 +1,166 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the Broadcast and Subscriber classes, which stream a live game to spectators.
+# Every move is framed once and the same bytes are queued for every subscriber, so a game with thousands of
+# spectators costs one encoding per move, not one per spectator.
+#
+# Each subscriber has its own bounded queue, drained by its own coroutine. Publishing never waits on a spectator: if
+# a subscriber's queue is full, its backlog is thrown away and replaced by a single MSG_STATE snapshot of the current
+# board, so it skips ahead to the latest state. A subscriber that has to skip ahead too many times is dropped.
+
+import asyncio
+import json
+from protocol import encode_frame, MSG_TEXT, MSG_STATE, MSG_MOVE
+
+
+class Subscriber:
+    """
+        This class streams the frames of a Broadcast to one spectator.
+
+        Attributes:
+            writer (asyncio.StreamWriter): Stream used to send frames to the spectator.
+            queue (asyncio.Queue): Frames waiting to be sent, None once the broadcast has ended for this spectator.
+            skips (int): The number of times the spectator fell behind and skipped ahead.
+
+        Methods:
+            run(): Coroutine that sends queued frames until the broadcast ends.
+    """
+
+    def __init__(self, writer, max_queue=32):
+        self.writer = writer
+        self.queue = asyncio.Queue(max_queue)
+        self.skips = 0
+
+    async def run(self):
+        """Sends queued frames to the spectator until the broadcast ends."""
+        while True:
+            frames = [await self.queue.get()]
+            while not self.queue.empty():
+                frames.append(self.queue.get_nowait())
+            # Write whatever is queued in one go, the spectator may have fallen behind
+            end = None in frames
+            self.writer.writelines(frame for frame in frames if frame is not None)
+            await self.writer.drain()
+            if end:
+                return
+
+    def skip_ahead(self, snapshot):
+        """Replaces the frames still queued with a snapshot of the current board."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(snapshot)
+        self.skips += 1
+
+
+class Broadcast:
+    """
+        This class fans the moves of a game out to its spectators.
+
+        Attributes:
+            tictactoe (TicTacToe): The board of the game being broadcast.
+            subscribers (set): The spectators watching the game.
+            max_skips (int): How many times a subscriber may skip ahead before it is dropped.
+            metrics (Metrics): Counts skipped and dropped subscribers, None to skip instrumentation.
+
+        Methods:
+            subscribe(writer: asyncio.StreamWriter) -> Subscriber: Adds a spectator to the game.
+            unsubscribe(subscriber: Subscriber): Removes a spectator from the game.
+            publish_move(payload: bytes): Sends an encoded move to every spectator.
+            close(game_status: str): Tells every spectator that the game is over.
+            snapshot() -> bytes: Returns a MSG_STATE frame of the current board.
+    """
+
+    def __init__(self, tictactoe, max_queue=32, max_skips=8, metrics=None):
+        self.tictactoe = tictactoe
+        self.subscribers = set()
+        self.max_queue = max(max_queue, 3)  # Room for a snapshot, the game over message and the end marker
+        self.max_skips = max_skips
+        self.metrics = metrics
+        self.game_status = "ongoing"
+        self.snapshot_frame = None
+        self.snapshot_moves = -1
+
+    def subscribe(self, writer):
+        """
+        Adds a spectator to the game, starting from a snapshot of the current board.
+
+        Parameters:
+            writer (asyncio.StreamWriter): Stream used to send frames to the spectator.
+
+        Returns:
+            Subscriber: The new subscriber, whose run() coroutine must be awaited to stream the game.
+        """
+        subscriber = Subscriber(writer, self.max_queue)
+        subscriber.queue.put_nowait(self.snapshot())
+        if self.game_status != "ongoing":
+            subscriber.queue.put_nowait(None)
+        else:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Removes a spectator from the game."""
+        self.subscribers.discard(subscriber)
+
+    def snapshot(self):
+        """
+        Returns a MSG_STATE frame of the current board, encoded at most once per move.
+
+        Returns:
+            bytes: The encoded frame.
+        """
+        if self.snapshot_moves != self.tictactoe.move_count or self.snapshot_frame is None:
+            tictactoe_data = {
+                "board size": self.tictactoe.size,
+                "win length": self.tictactoe.win_length,
+                "board": self.tictactoe.board,
+                "game status": self.game_status,
+                "turn": "X" if self.tictactoe.move_count % 2 == 0 else "O"
+            }
+            self.snapshot_frame = encode_frame(MSG_STATE, json.dumps(tictactoe_data).encode())
+            self.snapshot_moves = self.tictactoe.move_count
+        return self.snapshot_frame
+
+    def publish(self, frame):
+        """Queues a frame for every spectator, making the ones that have fallen behind skip ahead or dropping them."""
+        for subscriber in list(self.subscribers):
+            if not subscriber.queue.full():
+                subscriber.queue.put_nowait(frame)
+            elif subscriber.skips < self.max_skips:
+                subscriber.skip_ahead(self.snapshot())
+                if self.metrics is not None:
+                    self.metrics.increment('spectator_skips')
+            else:
+                self.drop(subscriber, "You fell too far behind the game and stopped watching.")
+
+    def publish_move(self, payload):
+        """Sends a move, already applied to the board, to every spectator."""
+        if self.subscribers:
+            self.publish(encode_frame(MSG_MOVE, payload))
+
+    def drop(self, subscriber, message):
+        """Removes a spectator that cannot keep up, telling it why if it can, and closes its connection."""
+        self.unsubscribe(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+        # The spectator fell behind by not reading, so run() is likely stuck in drain() and would never reach a
+        # queued message: write it directly, then abort the connection, which also wakes drain() up
+        subscriber.writer.write(encode_frame(MSG_TEXT, message.encode()))
+        subscriber.writer.transport.abort()
+        if self.metrics is not None:
+            self.metrics.increment('spectators_dropped')
+
+    def close(self, game_status):
+        """Tells every spectator that the game is over and ends their streams."""
+        self.game_status = game_status
+        self.snapshot_frame = None
+        game_over = encode_frame(MSG_TEXT, f"Game over: {game_status}".encode())
+        for subscriber in self.subscribers:
+            if subscriber.queue.maxsize - subscriber.queue.qsize() < 2:
+                subscriber.skip_ahead(self.snapshot())
+            subscriber.queue.put_nowait(game_over)
+            subscriber.queue.put_nowait(None)
+        self.subscribers.clear()
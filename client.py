@@ -14,7 +14,10 @@
 
 import socket
 import json
-from tictactoe import *
+from tictactoe import TicTacToe, instructions
+from transposition import TranspositionCache
+from protocol import (Connection, decode_move, decode_instructions, MSG_TEXT, MSG_QUIT, MSG_INSTRUCTIONS, MSG_STATE,
+                      MSG_MOVE, MSG_RESYNC, PLAY_REQUEST, STATUS_ONGOING, STATUS_WIN, STATUS_DRAW)
 
 
 class Client:
@@ -28,61 +31,102 @@ class Client:
             tictactoe (TicTacToe): The current tic-tac-toe game.
             tictactoe_player_server (str): The symbol representing the server player in the game.
             tictactoe_player_client (str): The symbol representing the client player in the game.
+            board_size (int): The number of rows and columns of the board in games this client starts.
+            win_length (int): How many marks in a row win games this client starts.
+            positions (TranspositionCache): Caches the rendered string of positions seen before.
 
         Methods:
             start_client(): Connects to the server and begins the game.
+            replay_move(index: int, move_status: int) -> str: Replays a move received from the server.
+            watch_update(msg_type: int, payload: bytes): Shows a snapshot or move of a game being watched.
         """
 
-    def __init__(self, host='localhost', port=2000):
+    def __init__(self, host='localhost', port=2000, board_size=3, win_length=3):
         self.host = host
         self.port = port
         self.tictactoe = None  # Store tictactoe object
         self.tictactoe_player_server = None  # Either x or o
         self.tictactoe_player_client = None  # Either x or o
+        self.board_size = board_size
+        self.win_length = win_length
+        self.positions = TranspositionCache()
 
     def start_client(self):
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
                 # Connect to the server
                 client_socket.connect((self.host, self.port))
+                connection = Connection(client_socket)
                 messages = [
                     f"Connected to: {self.host} on port: {self.port}",
                     "Type /q to quit",
                     "Enter message to send. Please wait for input prompt before entering message...",
-                    "Note: Type 'play tictactoe' to start a game of tictactoe",
+                    "Note: Type 'play tictactoe' to start a game of tictactoe, or 'watch <game id>' to watch one",
                 ]
                 print("\n".join(messages))
 
                 initial_message = True  # Flag first message has yet to be sent
                 game_mode = False  # Flag for game_mode
+                watch_mode = False  # Flag for watching another game
 
                 while True:
                     # Send initial message
                     if initial_message:
                         client_input = input('Enter Input >')
-                        client_socket.sendall(client_input.encode())
+                        connection.send(MSG_TEXT, client_input)
+                        watch_mode = client_input.startswith('watch')
                         initial_message = False
 
                     # Receive response from server and print
-                    server_response = client_socket.recv(4096).decode()
+                    msg_type, payload = connection.receive()
                     # If no response from server, then invalid
-                    if not server_response:
+                    if msg_type is None:
                         print("Received empty response from server")
                         break
                     # If server decides to quit, also quit
-                    if server_response == "/q":
+                    if msg_type == MSG_QUIT:
                         print("Server has decided to quit the program.")
                         break  # Break the loop and end the connection
 
+                    # Watching a game: show every update until the server sends a text message
+                    if watch_mode and msg_type in (MSG_STATE, MSG_MOVE):
+                        self.watch_update(msg_type, payload)
+                        continue
+                    watch_mode = False
+                    if msg_type == MSG_INSTRUCTIONS:
+                        # The side that sends the instructions chooses the board
+                        board_size, win_length, server_response = decode_instructions(payload)
+                    else:
+                        server_response = payload.decode() if msg_type != MSG_MOVE else ''
+
+                    # If playing tictactoe, replay the server's move on our own board
+                    if game_mode and msg_type == MSG_MOVE:
+                        index, move_status = decode_move(payload)
+                        game_status = self.replay_move(index, move_status)
+                        if game_status is None:
+                            print("Received a move that does not match the board, requesting the game state")
+                            connection.send(MSG_RESYNC)
+                            continue
+                        print(self.positions.render(self.tictactoe))
+                        # Handle game status
+                        if game_status != "ongoing":
+                            game_mode = False
+                            print(game_status)
+
+                    # Server left the game and sent a message instead of a move
+                    elif game_mode and msg_type == MSG_TEXT:
+                        print(server_response)
+                        game_mode = False
+
                     # If playing tictactoe, deal with JSON response object and update variables
-                    if game_mode:
+                    elif game_mode:
                         try:
                             response_object = json.loads(server_response)
                             self.tictactoe.board = response_object["board"]
                             self.tictactoe_player_client = response_object["client character"]
                             self.tictactoe_player_server = response_object["server character"]
                             game_status = response_object["game status"]
-                            print(self.tictactoe)
+                            print(self.positions.render(self.tictactoe))
                             # Handle game status
                             if game_status != "ongoing":
                                 game_mode = False
@@ -94,13 +138,13 @@ class Client:
                         print(server_response)
 
                     # If the client initialized the game and server responded with instructions, client starts move
-                    if server_response == instructions():
+                    if msg_type == MSG_INSTRUCTIONS:
                         game_mode = True
-                        self.tictactoe = TicTacToe()  # create store tictactoe object
+                        self.tictactoe = TicTacToe(board_size, win_length)  # create store tictactoe object
                         self.tictactoe_player_server = "O"
                         self.tictactoe_player_client = "X"
 
-                    # If playing tictactoe, make a move and send JSON object
+                    # If playing tictactoe, make a move and send it to the server
                     if game_mode:
                         valid_move = False
                         while not valid_move:
@@ -109,40 +153,39 @@ class Client:
                                 print("Client has decided to quit the game.")
                                 game_mode = False
                                 break
-                            valid_move = self.tictactoe.move(int(client_input), self.tictactoe_player_client)
+                            index = int(client_input)
+                            valid_move = self.tictactoe.move(index, self.tictactoe_player_client)
                             if not valid_move:
                                 print("Invalid move. Please try again.")
 
-                        print(str(self.tictactoe))
+                        if not valid_move:
+                            connection.send(MSG_TEXT, "Client has decided to quit the game.")
+                            continue
 
-                        game_status = "ongoing"
+                        print(self.positions.render(self.tictactoe))
+
+                        move_status = STATUS_ONGOING
                         # Check for winner or draw after the client's move
                         if self.tictactoe.check_winner(self.tictactoe_player_client):
                             print("Client won the game!")
-                            game_status = "Client won"
+                            move_status = STATUS_WIN
                             game_mode = False
                         elif self.tictactoe.check_draw():
                             print("The game is a draw!")
-                            game_status = "draw"
+                            move_status = STATUS_DRAW
                             game_mode = False
 
-                        tictactoe_data = {
-                            "server character": self.tictactoe_player_server,
-                            "client character": self.tictactoe_player_client,
-                            "board": self.tictactoe.board,
-                            "game status": game_status
-                        }
-                        json_tictactoe_data = json.dumps(tictactoe_data)
-                        client_socket.sendall(json_tictactoe_data.encode())
+                        connection.send_move(index, move_status)
 
                     # Initialize game
-                    elif server_response == 'play tictactoe':
+                    elif msg_type == MSG_TEXT and payload == PLAY_REQUEST:
                         print("initializing Tic-Tac-Toe from server request")
                         game_mode = True  # Set game_mode flag
-                        self.tictactoe = TicTacToe()
-                        tictactoe_instructions = instructions()
-                        print(tictactoe_instructions)
-                        client_socket.sendall(tictactoe_instructions.encode())
+                        self.tictactoe = TicTacToe(self.board_size, self.win_length)
+                        self.tictactoe_player_server = "X"
+                        self.tictactoe_player_client = "O"
+                        print(instructions(self.board_size, self.win_length))
+                        connection.send_instructions(self.board_size, self.win_length)
 
                     # Normal Messages
                     else:
@@ -150,13 +193,62 @@ class Client:
                         client_input = input('Enter Input >')
                         if client_input == "/q":
                             print("Client has decided to quit the program.")
-                            client_socket.sendall("/q".encode())  # Inform server about termination
+                            connection.send(MSG_QUIT)  # Inform server about termination
                             break  # Break the loop and end the connection
-                        client_socket.sendall(client_input.encode())
+                        connection.send(MSG_TEXT, client_input)
+                        watch_mode = client_input.startswith('watch')
 
         except Exception as e:
             print(f"An error occurred: {e}")
 
+    def replay_move(self, index, move_status):
+        """
+        Replays a move received from the server on the client's own board.
+
+        Parameters:
+            index (int): The index of the cell the server marked.
+            move_status (int): The game status the server reported after its move.
+
+        Returns:
+            str: The game status after the move, or None if the move is invalid or the reported status is wrong.
+        """
+        if not 0 <= index < self.tictactoe.cell_count:
+            return None
+        if not self.tictactoe.move(index, self.tictactoe_player_server):
+            return None
+
+        if self.tictactoe.check_winner(self.tictactoe_player_server):
+            game_status, expected_status = "Server won", STATUS_WIN
+        elif self.tictactoe.check_draw():
+            game_status, expected_status = "draw", STATUS_DRAW
+        else:
+            game_status, expected_status = "ongoing", STATUS_ONGOING
+        if move_status != expected_status:
+            # Reported status disagrees with the board, undo the move before asking the server for its board
+            self.tictactoe.board = [' ' if i == index else cell for i, cell in enumerate(self.tictactoe.board)]
+            return None
+        return game_status
+
+    def watch_update(self, msg_type, payload):
+        """
+        Shows a snapshot or a move of a game the client is watching.
+
+        Parameters:
+            msg_type (int): MSG_STATE for a snapshot of the whole board, MSG_MOVE for a single move.
+            payload (bytes): The payload of the message.
+        """
+        if msg_type == MSG_STATE:
+            response_object = json.loads(payload)
+            self.tictactoe = TicTacToe(response_object["board size"], response_object["win length"])
+            self.tictactoe.board = response_object["board"]
+            print(f"Watching a game, {response_object['turn']} to move")
+        else:
+            index, _ = decode_move(payload)
+            player = "X" if self.tictactoe.move_count % 2 == 0 else "O"
+            self.tictactoe.move(index, player)
+            print(f"{player} marked {index}")
+        print(self.positions.render(self.tictactoe))
+
 
 if __name__ == "__main__":
     client = Client()
@@ -0,0 +1,248 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the JournalWriter and JournalReader classes, an append-only record of every game
+# played on the server. The journal is a flat file of fixed-size 16 byte records, each tagged with its session id:
+#
+#     session id (8) | sequence (2) | kind (1) | cell (1) | player (1) | board size (1) | win length (1) | result (1)
+#
+# A game is a START record, one MOVE record per move and an END record. The writer buffers records in memory and
+# writes them with a single write() and fsync() per commit (group commit), instead of one fsync per move. If the
+# process dies, at most the last commit interval of moves is lost, and a torn record at the end of the file is ignored.
+#
+# The reader memory-maps the journal and walks it record by record, so millions of games can be replayed or scanned
+# for statistics without loading the file into memory. Run "python journal.py stats <path>" for a summary, or
+# "python journal.py replay <path> <session id>" to print the board of a game.
+
+import mmap
+import os
+import struct
+from collections import Counter
+from tictactoe import TicTacToe
+
+RECORD = struct.Struct('<QHBBBBBB')
+
+# Record kinds
+KIND_START = 1
+KIND_MOVE = 2
+KIND_END = 3
+
+# Players, as stored in the player field
+PLAYER_CODES = {'X': 1, 'O': 2}
+PLAYERS = {1: 'X', 2: 'O'}
+
+# Game results, as stored in the result field of END records
+RESULT_DRAW = 0
+RESULT_X_WON = 1
+RESULT_O_WON = 2
+RESULT_ABORTED = 3
+RESULT_NAMES = {RESULT_DRAW: "draw", RESULT_X_WON: "X won", RESULT_O_WON: "O won", RESULT_ABORTED: "aborted"}
+
+
+class JournalWriter:
+    """
+        This class appends game records to a journal file with group commit.
+
+        Attributes:
+            path (str): The journal file.
+            journal_file (file): The journal file, opened for appending.
+            pending (bytearray): Records written since the last commit.
+            sequences (dict): The number of records written so far for each open session.
+
+        Methods:
+            start(session_id: int, size: int, win_length: int): Records the start of a game.
+            move(session_id: int, index: int, player: str): Records a move.
+            end(session_id: int, result: int): Records the end of a game.
+            take_pending() -> bytes: Removes and returns the records waiting to be committed.
+            commit(): Writes and fsyncs the pending records.
+            close(): Commits the pending records and closes the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_file = open(path, 'ab', buffering=0)
+        self.pending = bytearray()
+        self.sequences = {}
+
+    def append(self, session_id, kind, cell=0, player=0, size=0, win_length=0, result=0):
+        """Adds a record to the pending batch. Nothing reaches the file until the next commit."""
+        sequence = self.sequences.get(session_id, 0)
+        self.sequences[session_id] = sequence + 1
+        self.pending += RECORD.pack(session_id, sequence & 0xFFFF, kind, cell, player, size, win_length, result)
+
+    def start(self, session_id, size, win_length):
+        """Records the start of a game."""
+        self.sequences[session_id] = 0
+        self.append(session_id, KIND_START, size=size, win_length=win_length)
+
+    def move(self, session_id, index, player):
+        """Records a move."""
+        self.append(session_id, KIND_MOVE, cell=index, player=PLAYER_CODES[player])
+
+    def end(self, session_id, result):
+        """Records the end of a game."""
+        self.append(session_id, KIND_END, result=result)
+        self.sequences.pop(session_id, None)
+
+    def take_pending(self):
+        """
+        Removes the records waiting to be committed, so they can be written outside the event loop.
+
+        Returns:
+            bytes: The pending records.
+        """
+        data = bytes(self.pending)
+        self.pending.clear()
+        return data
+
+    def write(self, data):
+        """Writes records to the journal and waits until they are on disk."""
+        if data:
+            self.journal_file.write(data)
+            os.fsync(self.journal_file.fileno())
+
+    def commit(self):
+        """Writes and fsyncs the pending records."""
+        self.write(self.take_pending())
+
+    def close(self):
+        """Commits the pending records and closes the file."""
+        self.commit()
+        self.journal_file.close()
+
+
+class JournalReader:
+    """
+        This class reads a journal file through a memory map.
+
+        Attributes:
+            path (str): The journal file.
+            record_count (int): The number of complete records in the journal.
+
+        Methods:
+            records() -> iterator: Yields every record as a tuple.
+            replay(session_id: int) -> TicTacToe: Rebuilds the board of a game.
+            unfinished_sessions() -> dict: Rebuilds the board of every game that has no END record.
+            max_session_id() -> int: Returns the largest session id in the journal.
+            statistics() -> dict: Summarizes every game in the journal.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.journal_file = open(path, 'rb')
+        size = os.fstat(self.journal_file.fileno()).st_size
+        self.record_count = size // RECORD.size  # A torn record at the end is ignored
+        self.journal_map = None
+        if self.record_count:
+            self.journal_map = mmap.mmap(self.journal_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def records(self):
+        """
+        Yields every record of the journal, in the order they were written.
+
+        Returns:
+            iterator: (session_id, sequence, kind, cell, player, size, win_length, result) tuples.
+        """
+        if self.journal_map is None:
+            return iter(())
+        return RECORD.iter_unpack(memoryview(self.journal_map)[:self.record_count * RECORD.size])
+
+    def replay(self, session_id):
+        """
+        Rebuilds the board of a game from its records.
+
+        Parameters:
+            session_id (int): The session to replay.
+
+        Returns:
+            TicTacToe: The board after the last recorded move, or None if the session is not in the journal.
+        """
+        tictactoe = None
+        for record_session_id, _, kind, cell, player, size, win_length, _ in self.records():
+            if record_session_id != session_id:
+                continue
+            if kind == KIND_START:
+                tictactoe = TicTacToe(size, win_length)
+            elif kind == KIND_MOVE and tictactoe is not None:
+                tictactoe.move(cell, PLAYERS[player])
+        return tictactoe
+
+    def unfinished_sessions(self):
+        """
+        Rebuilds the board of every game that was interrupted before its END record, for crash recovery.
+
+        Returns:
+            dict: The TicTacToe of each unfinished game, by session id.
+        """
+        games = {}
+        for session_id, _, kind, cell, player, size, win_length, _ in self.records():
+            if kind == KIND_START:
+                games[session_id] = TicTacToe(size, win_length)
+            elif kind == KIND_MOVE and session_id in games:
+                games[session_id].move(cell, PLAYERS[player])
+            elif kind == KIND_END:
+                games.pop(session_id, None)
+        return games
+
+    def max_session_id(self):
+        """Returns the largest session id in the journal, or 0 if it is empty."""
+        return max((record[0] for record in self.records()), default=0)
+
+    def statistics(self):
+        """
+        Summarizes every game in the journal in a single pass.
+
+        Returns:
+            dict: The number of games, moves and results, and the most common opening cells.
+        """
+        results = Counter()
+        openings = Counter()
+        games = moves = 0
+        for _, sequence, kind, cell, _, _, _, result in self.records():
+            if kind == KIND_START:
+                games += 1
+            elif kind == KIND_MOVE:
+                moves += 1
+                if sequence == 1:
+                    openings[cell] += 1
+            elif kind == KIND_END:
+                results[RESULT_NAMES.get(result, "unknown")] += 1
+        return {
+            "games": games,
+            "moves": moves,
+            "results": dict(results),
+            "unfinished": games - sum(results.values()),
+            "openings": openings.most_common(3),
+        }
+
+    def close(self):
+        """Unmaps and closes the journal."""
+        if self.journal_map is not None:
+            self.journal_map.close()
+        self.journal_file.close()
+
+
+if __name__ == "__main__":
+    import argparse  # Only the command line needs it, not the servers that import the journal
+
+    parser = argparse.ArgumentParser(description="Inspect a game journal.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    stats_parser = subparsers.add_parser('stats', help="summarize every game in the journal")
+    stats_parser.add_argument('path')
+    replay_parser = subparsers.add_parser('replay', help="print the board of a game")
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('session_id', type=int)
+    args = parser.parse_args()
+
+    reader = JournalReader(args.path)
+    if args.command == 'stats':
+        statistics = reader.statistics()
+        print(f"Games: {statistics['games']}, moves: {statistics['moves']}, unfinished: {statistics['unfinished']}")
+        for result, count in sorted(statistics['results'].items()):
+            print(f"    {result}: {count}")
+        print(f"Most common openings: {statistics['openings']}")
+    else:
+        tictactoe = reader.replay(args.session_id)
+        print(tictactoe if tictactoe is not None else f"Session {args.session_id} is not in the journal")
+    reader.close()
@@ -0,0 +1,134 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the Launcher class, which runs the AsyncServer on every core of the host. It forks
+# a number of worker processes that each bind the same port with SO_REUSEPORT, so the kernel spreads incoming
+# connections across them. A game session lives entirely inside the worker that accepted its players, so the
+# workers share nothing and never lock each other.
+#
+# The launcher restarts any worker that dies. On SIGTERM or Ctrl+C it asks every worker to shut down gracefully:
+# workers stop accepting connections, let their games in progress finish, then exit.
+# SO_REUSEPORT and fork() are only available on Linux and other Unix systems.
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+from async_server import AsyncServer
+
+
+class Launcher:
+    """
+        This class runs several AsyncServer worker processes sharing one port.
+
+        Attributes:
+            workers (int): The number of worker processes to run.
+            server_options (dict): Keyword arguments passed to every worker's AsyncServer.
+            restart_delay (float): Seconds to wait before restarting a worker that died.
+            children (dict): The worker index of each running worker process, by pid.
+            stopping (bool): True once a shutdown has been requested.
+
+        Methods:
+            start(): Starts the workers and supervises them until they have all shut down.
+            stop(): Asks every worker to shut down gracefully.
+    """
+
+    def __init__(self, workers=None, restart_delay=1.0, **server_options):
+        self.workers = workers or os.cpu_count()
+        self.server_options = server_options
+        self.restart_delay = restart_delay
+        self.children = {}
+        self.stopping = False
+
+    def start(self):
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise OSError("SO_REUSEPORT is not supported on this system")
+        if self.server_options.get('ai'):
+            from ai import AIPlayer
+            AIPlayer().close()  # Solve the table once, before the workers race to write it
+
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        print(f"Starting {self.workers} workers")
+        for index in range(self.workers):
+            self.spawn(index)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            print(f"Worker {index} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            time.sleep(self.restart_delay)  # Avoid a tight loop if the worker keeps crashing
+            if not self.stopping:
+                self.spawn(index)
+        print("All workers have shut down")
+
+    def spawn(self, index):
+        """Forks a worker process."""
+        pid = os.fork()
+        if pid:
+            self.children[pid] = index
+            return
+
+        # Worker process: the launcher forwards Ctrl+C as SIGTERM, so only SIGTERM should stop it
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            options = dict(self.server_options)
+            if options.get('metrics_port') is not None:
+                options['metrics_port'] += index  # Every worker serves its own metrics
+            if options.get('journal_path') is not None:
+                options['journal_path'] = f"{options['journal_path']}.{index}"  # And writes its own journal
+            server = AsyncServer(reuse_port=True, **options)
+            server.start_server()
+        except Exception as e:
+            print(f"Worker {index} failed: {type(e).__name__}: {e}")
+            exit_code = 1
+        finally:
+            # os._exit() skips the interpreter's cleanup, so buffered output would be lost when stdout is a pipe
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)  # Never return into the launcher's code
+
+    def stop(self, signum=None, frame=None):
+        """Asks every worker to shut down gracefully."""
+        if not self.stopping:
+            print("Shutting down workers")
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the tic-tac-toe server on several cores.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--host', default='localhost', help="host name/IP address to listen on")
+    parser.add_argument('--port', type=int, default=2000, help="port number to listen on")
+    parser.add_argument('--ai', action='store_true', help="pair every player with the AI")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="serve the metrics of worker i on this port + i")
+    parser.add_argument('--shutdown-timeout', type=float, default=10.0,
+                        help="seconds to let games in progress finish on shutdown")
+    parser.add_argument('--journal', default=None, help="record the games of worker i in the file JOURNAL.i")
+    parser.add_argument('--turn-timeout', type=float, default=60.0, help="seconds a player has to move")
+    parser.add_argument('--idle-timeout', type=float, default=300.0,
+                        help="seconds before an idle connection outside of a game is closed")
+    parser.add_argument('--max-connections', type=int, default=10000, help="connections allowed per worker")
+    args = parser.parse_args()
+
+    launcher = Launcher(args.workers, host=args.host, port=args.port, ai=args.ai, metrics_port=args.metrics_port,
+                        shutdown_timeout=args.shutdown_timeout, journal_path=args.journal,
+                        turn_timeout=args.turn_timeout, idle_timeout=args.idle_timeout,
+                        max_connections=args.max_connections)
+    launcher.start()
@@ -0,0 +1,196 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the LoadTester class, a headless client that simulates many players at once
+# against the AsyncServer (or any server speaking the same protocol). Every simulated player runs in its own coroutine,
+# opens its own connection, types 'play tictactoe' and plays full games with random moves, without printing boards
+# or waiting for input.
+#
+# When it finishes, it reports games/sec, the p50/p95/p99 round trip latency of a move (from sending the move until
+# the server's reply arrives) and the number of errors of each kind. Run the server with --ai to measure the server
+# alone, or without it to have the simulated players paired with each other.
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from async_server import Player
+from tictactoe import TicTacToe
+from protocol import (ProtocolError, encode_move, decode_move, encode_instructions, decode_instructions, MSG_TEXT,
+                      MSG_QUIT, MSG_INSTRUCTIONS, MSG_STATE, MSG_MOVE, PLAY_REQUEST, STATUS_ONGOING, STATUS_WIN,
+                      STATUS_DRAW)
+
+
+def percentile(sorted_values, fraction):
+    """Returns the value below which the given fraction of the sorted values fall."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class LoadTester:
+    """
+        This class simulates many concurrent players against a tic-tac-toe server.
+
+        Attributes:
+            host (str): The host name/IP address of the server to connect to.
+            port (int): The port number of the server to connect to.
+            players (int): The number of players to simulate at once.
+            games_per_player (int): How many games each player plays before disconnecting.
+            timeout (float): Seconds to wait for any single reply before counting an error.
+            board_size (int): The board size the simulated players ask for when they start a game.
+            win_length (int): The win length the simulated players ask for when they start a game.
+            latencies (list): The round trip time of every move, in seconds.
+            games_completed (int): The number of games played to the end.
+            errors (Counter): The number of errors of each kind.
+
+        Methods:
+            run(): Runs the load test and prints the report.
+            play(player_id: int): Coroutine that simulates a single player.
+    """
+
+    def __init__(self, host='localhost', port=2000, players=1000, games_per_player=10, timeout=10.0,
+                 board_size=3, win_length=3):
+        self.host = host
+        self.port = port
+        self.players = players
+        self.games_per_player = games_per_player
+        self.timeout = timeout
+        self.board_size = board_size
+        self.win_length = win_length
+        self.latencies = []
+        self.games_completed = 0
+        self.errors = Counter()
+
+    def run(self):
+        start = time.perf_counter()
+        asyncio.run(self.play_all())
+        self.report(time.perf_counter() - start)
+
+    async def play_all(self):
+        await asyncio.gather(*(self.play(player_id) for player_id in range(self.players)))
+
+    async def play(self, player_id):
+        """Simulates a single player: connects, plays its games, then quits."""
+        rng = random.Random(player_id)
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            self.errors[f"connect: {type(e).__name__}"] += 1
+            return
+
+        player = Player(reader, writer)
+        try:
+            for _ in range(self.games_per_player):
+                if not await self.play_game(player, rng):
+                    break
+                self.games_completed += 1
+            await player.send(MSG_QUIT)
+        except (ConnectionError, ProtocolError, asyncio.TimeoutError) as e:
+            self.errors[type(e).__name__] += 1
+        finally:
+            writer.close()
+
+    async def receive(self, player):
+        """Waits for the next message from the server, for at most the timeout."""
+        return await asyncio.wait_for(player.receive(), self.timeout)
+
+    async def play_game(self, player, rng):
+        """
+        Plays a single game to the end.
+
+        Returns:
+            bool: True if the game finished normally, False if it ended with an error.
+        """
+        await player.send_payload(MSG_TEXT, PLAY_REQUEST)
+        tictactoe = None
+        me = opponent = None
+        sent_at = None  # When our last move was sent, to time the server's reply
+
+        while True:
+            msg_type, payload = await self.receive(player)
+            if sent_at is not None:
+                self.latencies.append(time.perf_counter() - sent_at)
+                sent_at = None
+
+            if msg_type is None or msg_type == MSG_QUIT:
+                self.errors["disconnected"] += 1
+                return False
+
+            if tictactoe is None:
+                # Waiting for the game to start: the first player gets the instructions, the second is asked to play
+                if msg_type == MSG_INSTRUCTIONS:
+                    board_size, win_length, _ = decode_instructions(payload)
+                    tictactoe, me, opponent = TicTacToe(board_size, win_length), 'X', 'O'
+                elif msg_type == MSG_TEXT and payload == PLAY_REQUEST:
+                    await player.send_payload(MSG_INSTRUCTIONS, encode_instructions(self.board_size, self.win_length))
+                    tictactoe, me, opponent = TicTacToe(self.board_size, self.win_length), 'O', 'X'
+                    continue
+                else:
+                    self.errors["unexpected message"] += 1
+                    return False
+
+            elif msg_type == MSG_MOVE:
+                index, move_status = decode_move(payload)
+                if not 0 <= index < tictactoe.cell_count or not tictactoe.move(index, opponent):
+                    self.errors["invalid move from server"] += 1
+                    return False
+                if move_status != STATUS_ONGOING:
+                    return True
+
+            elif msg_type == MSG_STATE:
+                # Server rejected our last move and sent the authoritative board
+                self.errors["resync"] += 1
+                tictactoe.board = json.loads(payload)["board"]
+
+            elif msg_type == MSG_TEXT:
+                # Game over message after our winning move, or the opponent left
+                if payload.startswith(b'Game over'):
+                    return True
+                self.errors["game aborted"] += 1
+                return False
+
+            else:
+                self.errors["unexpected message"] += 1
+                return False
+
+            index = rng.choice([i for i, cell in enumerate(tictactoe.board) if cell == ' '])
+            tictactoe.move(index, me)
+            move_status = STATUS_ONGOING
+            if tictactoe.check_winner(me):
+                move_status = STATUS_WIN
+            elif tictactoe.check_draw():
+                move_status = STATUS_DRAW
+            sent_at = time.perf_counter()
+            await player.send_payload(MSG_MOVE, encode_move(index, move_status))
+
+    def report(self, seconds):
+        """Prints the results of the load test."""
+        latencies = sorted(self.latencies)
+        print(f"Players: {self.players}, games completed: {self.games_completed} in {seconds:.2f}s "
+              f"({self.games_completed / seconds:,.1f} games/sec)")
+        print(f"Move round trip over {len(latencies)} moves: "
+              f"p50 {percentile(latencies, 0.50) * 1000:.2f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.2f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+        print(f"Errors: {sum(self.errors.values())}")
+        for error, count in self.errors.most_common():
+            print(f"    {error}: {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate many concurrent players against a tic-tac-toe server.")
+    parser.add_argument('--host', default='localhost', help="host name/IP address of the server")
+    parser.add_argument('--port', type=int, default=2000, help="port number of the server")
+    parser.add_argument('--players', type=int, default=1000, help="number of players to simulate at once")
+    parser.add_argument('--games', type=int, default=10, help="number of games each player plays")
+    parser.add_argument('--timeout', type=float, default=10.0, help="seconds to wait for a reply from the server")
+    parser.add_argument('--size', type=int, default=3, help="number of rows and columns of the board")
+    parser.add_argument('--win-length', type=int, default=3, help="how many marks in a row win a game")
+    args = parser.parse_args()
+
+    load_tester = LoadTester(args.host, args.port, args.players, args.games, args.timeout, args.size, args.win_length)
+    load_tester.run()
@@ -0,0 +1,247 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the Metrics class, which counts what the servers do and how long the hot path
+# takes: messages and bytes in and out, decode errors, invalid moves, and latency histograms for json encoding and
+# decoding, TicTacToe.move() and socket sends.
+#
+# Metrics.start_http_server() serves the numbers as plain text in the Prometheus exposition format, for example
+# with curl http://localhost:9100/metrics. Requesting /profile?sessions=N asks the AsyncServer to run the next N game
+# sessions under cProfile; the profile of each session is written to session-<id>.prof in the profile directory.
+
+import os
+import threading
+import types
+from bisect import bisect_left
+from collections import defaultdict
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0
+)
+
+
+class Histogram:
+    """
+        This class counts observed durations in fixed latency buckets.
+
+        Attributes:
+            counts (list): The number of observations in each bucket, the last one for values over every bound.
+            total (float): The sum of every observation.
+            count (int): The number of observations.
+
+        Methods:
+            observe(seconds: float): Records a duration.
+    """
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        """Records a duration."""
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class Metrics:
+    """
+        This class collects the counters, gauges and latency histograms of a server.
+
+        Attributes:
+            prefix (str): Prepended to the name of every metric.
+            counters (defaultdict): The value of each counter, by name.
+            gauges (dict): A function returning the current value of each gauge, by name.
+            histograms (defaultdict): The Histogram of each timed operation, by name.
+            profile_requests (int): The number of upcoming game sessions to run under cProfile.
+            profile_dir (str): The directory session profiles are written to.
+
+        Methods:
+            increment(name: str, amount: int): Adds to a counter.
+            observe(name: str, seconds: float): Records a duration in a histogram.
+            gauge(name: str, function): Registers a gauge.
+            render() -> str: Returns every metric in the Prometheus text format.
+            start_http_server(host: str, port: int, loop): Serves the metrics over HTTP from a background thread.
+            request_profiles(sessions: int) -> str: Asks for the next sessions to be profiled.
+            take_profile_request() -> bool: Returns True if the next session should be profiled.
+    """
+
+    def __init__(self, prefix='tictactoe', profile_dir='.'):
+        self.prefix = prefix
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self.histograms = defaultdict(Histogram)
+        self.profile_requests = 0
+        self.profile_dir = profile_dir
+
+    def increment(self, name, amount=1):
+        """Adds to a counter."""
+        self.counters[name] += amount
+
+    def observe(self, name, seconds):
+        """Records a duration in the histogram of an operation."""
+        self.histograms[name].observe(seconds)
+
+    def gauge(self, name, function):
+        """Registers a gauge, whose value is read from the function every time the metrics are rendered."""
+        self.gauges[name] = function
+
+    def render(self):
+        """
+        Returns every metric in the Prometheus text format.
+
+        Returns:
+            str: One line per counter, gauge and histogram bucket.
+        """
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {self.prefix}_{name}_total counter")
+            lines.append(f"{self.prefix}_{name}_total {value}")
+        for name, function in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {self.prefix}_{name} gauge")
+            lines.append(f"{self.prefix}_{name} {function()}")
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"{self.prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum {histogram.total}")
+            lines.append(f"{metric}_count {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def start_http_server(self, host='localhost', port=9100, loop=None):
+        """
+        Serves the metrics over HTTP from a daemon thread.
+
+        Parameters:
+            host (str): The host name/IP address to listen on.
+            port (int): The port number to listen on.
+            loop (asyncio.AbstractEventLoop): The event loop that updates the metrics. When given, every request
+                reads the metrics and records profile requests on the loop, never while the loop is changing them.
+
+        Returns:
+            ThreadingHTTPServer: The running HTTP server.
+        """
+        # Imported here, http.server alone takes longer to import than the rest of the server
+        from concurrent.futures import Future
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import urlparse, parse_qs
+
+        metrics = self
+
+        def call(function, *args):
+            """Runs a function on the event loop, if there is one, and returns its result to the HTTP thread."""
+            if loop is None:
+                return function(*args)
+            result = Future()
+
+            def run():
+                try:
+                    result.set_result(function(*args))
+                except Exception as e:
+                    result.set_exception(e)
+
+            loop.call_soon_threadsafe(run)
+            return result.result(timeout=5.0)
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                try:
+                    if url.path == '/metrics':
+                        body = call(metrics.render)
+                    elif url.path == '/profile':
+                        try:
+                            sessions = int(parse_qs(url.query).get('sessions', ['1'])[0])
+                        except ValueError:
+                            sessions = -1
+                        if sessions < 0:
+                            self.send_error(400, "sessions must be a non-negative integer")
+                            return
+                        body = call(metrics.request_profiles, sessions)
+                    else:
+                        self.send_error(404)
+                        return
+                except (RuntimeError, TimeoutError):  # The event loop has stopped, or is too busy to answer
+                    self.send_error(503)
+                    return
+                encoded_body = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(encoded_body)))
+                self.end_headers()
+                self.wfile.write(encoded_body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes are too frequent to print
+
+        http_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=http_server.serve_forever, daemon=True).start()
+        print(f"Metrics are served on: http://{host}:{port}/metrics")
+        return http_server
+
+    def request_profiles(self, sessions):
+        """
+        Asks for the next sessions to be profiled.
+
+        Parameters:
+            sessions (int): The number of sessions to profile, on top of the ones already requested.
+
+        Returns:
+            str: A description of the profiles that will be written.
+        """
+        self.profile_requests += sessions
+        return f"Profiling the next {self.profile_requests} sessions into {self.profile_dir}\n"
+
+    def take_profile_request(self):
+        """Returns True, once per request made to /profile, when the next session should be profiled."""
+        if self.profile_requests <= 0:
+            return False
+        self.profile_requests -= 1
+        return True
+
+    def profile_path(self, session_id):
+        """Returns the file the profile of a session is written to."""
+        return os.path.join(self.profile_dir, f"session-{session_id}.prof")
+
+
+def profiled(coroutine, profiler):
+    """
+    Runs a coroutine with a profiler enabled only while the coroutine itself is running, so the time other sessions
+    spend between its awaits is not counted.
+
+    Parameters:
+        coroutine (coroutine): The coroutine to run.
+        profiler (cProfile.Profile): The profiler to enable.
+
+    Returns:
+        coroutine: A coroutine returning the result of the original one.
+    """
+    @types.coroutine
+    def driver():
+        value, error = None, None
+        while True:
+            profiler.enable()
+            try:
+                if error is None:
+                    future = coroutine.send(value)
+                else:
+                    future = coroutine.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                profiler.disable()
+            try:
+                value, error = (yield future), None
+            except BaseException as e:
+                value, error = None, e
+
+    return driver()
@@ -0,0 +1,310 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the framing layer shared by the server and client. TCP is a byte stream, so a
+# single recv() may return part of a message or several messages at once. Every message is therefore sent as a frame:
+#
+#     +----------------------+-----------+------------------+
+#     | length (4 bytes, BE) | type (1B) | payload (length) |
+#     +----------------------+-----------+------------------+
+#
+# The FrameDecoder class reassembles frames from whatever chunks the socket happens to return, and the Connection
+# class wraps a blocking socket so the server and client can send and receive whole messages.
+#
+# During a game only the move itself is sent, as a two byte MSG_MOVE payload: the index of the marked cell and the
+# game status after the move. The receiver replays the move on its own board, and asks for the full JSON game state
+# with MSG_RESYNC only when the move does not apply cleanly.
+#
+# The MSG_INSTRUCTIONS payload starts with the board size and win length, so both sides play on the same board. It
+# is encoded once per board and reused for every game, and a request to play is recognized by comparing the raw
+# payload with PLAY_REQUEST, without decoding it.
+
+import struct
+import time
+from collections import deque
+from functools import lru_cache
+from tictactoe import instructions
+
+# Message types
+MSG_TEXT = 1  # Chat message typed by a user
+MSG_QUIT = 2  # Peer is closing the connection
+MSG_INSTRUCTIONS = 3  # Game has started, see encode_instructions()
+MSG_STATE = 4  # JSON game state, sent in reply to MSG_RESYNC
+MSG_MOVE = 5  # Binary move, see encode_move()
+MSG_RESYNC = 6  # Request for the full game state
+
+PLAY_REQUEST = b'play tictactoe'  # MSG_TEXT payload asking to start a game
+
+# Game status after a move, from the point of view of the player that moved
+STATUS_ONGOING = 0
+STATUS_WIN = 1
+STATUS_DRAW = 2
+
+HEADER = struct.Struct('>IB')  # Payload length, message type
+MOVE = struct.Struct('>BB')  # Cell index, game status
+GAME_CONFIG = struct.Struct('>BB')  # Board size, win length
+MAX_PAYLOAD_SIZE = 1 << 20  # Refuse frames larger than 1 MiB
+MAX_BOARD_SIZE = 15  # Largest board whose cell indexes fit in the one byte of a move
+
+
+class ProtocolError(Exception):
+    """Raised when the peer sends data that is not a valid frame."""
+
+
+def encode_frame(msg_type, payload=b''):
+    """
+    Encodes a message as a frame.
+
+    Parameters:
+        msg_type (int): One of the MSG_* message types.
+        payload (bytes): The message body.
+
+    Returns:
+        bytes: The frame, ready to be written to a socket.
+    """
+    if len(payload) > MAX_PAYLOAD_SIZE:
+        raise ProtocolError(f"Payload of {len(payload)} bytes is too large")
+    return HEADER.pack(len(payload), msg_type) + payload
+
+
+def encode_move(index, status):
+    """
+    Encodes a move as a MSG_MOVE payload.
+
+    Parameters:
+        index (int): The index of the cell the player marked.
+        status (int): One of the STATUS_* codes, the game status after the move.
+
+    Returns:
+        bytes: The two byte payload.
+    """
+    return MOVE.pack(index, status)
+
+
+def decode_move(payload):
+    """
+    Decodes a MSG_MOVE payload.
+
+    Parameters:
+        payload (bytes): The payload of a MSG_MOVE frame.
+
+    Returns:
+        tuple: The (index, status) of the move.
+    """
+    if len(payload) != MOVE.size:
+        raise ProtocolError(f"Move payload must be {MOVE.size} bytes, got {len(payload)}")
+    return MOVE.unpack(payload)
+
+
+@lru_cache(maxsize=None)
+def encode_instructions(size, win_length):
+    """
+    Encodes the start of a game as a MSG_INSTRUCTIONS payload, once per board.
+
+    Parameters:
+        size (int): The number of rows and columns of the board.
+        win_length (int): How many marks in a row win the game.
+
+    Returns:
+        bytes: The board size and win length, followed by the instructions text.
+    """
+    if not 1 <= size <= MAX_BOARD_SIZE:
+        raise ProtocolError(f"Board size must be between 1 and {MAX_BOARD_SIZE}, got {size}")
+    return GAME_CONFIG.pack(size, win_length) + instructions(size, win_length).encode()
+
+
+def decode_instructions(payload):
+    """
+    Decodes a MSG_INSTRUCTIONS payload.
+
+    Parameters:
+        payload (bytes): The payload of a MSG_INSTRUCTIONS frame.
+
+    Returns:
+        tuple: The (size, win_length, text) of the game.
+    """
+    if len(payload) < GAME_CONFIG.size:
+        raise ProtocolError("Instructions payload is missing the board size")
+    size, win_length = GAME_CONFIG.unpack_from(payload)
+    return size, win_length, payload[GAME_CONFIG.size:].decode()
+
+
+class FrameDecoder:
+    """
+        This class reassembles frames from a stream of bytes.
+
+        Attributes:
+            buffer (bytearray): Bytes received that do not yet form a complete frame.
+
+        Methods:
+            feed(data: bytes) -> list: Adds received bytes and returns every frame they complete.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Adds received bytes to the decoder.
+
+        Parameters:
+            data (bytes): A chunk of bytes read from the socket, of any size.
+
+        Returns:
+            list: A (msg_type, payload) tuple for every frame completed by the chunk, in order.
+        """
+        self.buffer += data
+        messages = []
+        offset = 0
+        while len(self.buffer) - offset >= HEADER.size:
+            length, msg_type = HEADER.unpack_from(self.buffer, offset)
+            if length > MAX_PAYLOAD_SIZE:
+                raise ProtocolError(f"Frame of {length} bytes is too large")
+            end = offset + HEADER.size + length
+            if len(self.buffer) < end:
+                break  # Wait for the rest of the frame
+            messages.append((msg_type, bytes(self.buffer[offset + HEADER.size:end])))
+            offset = end
+        del self.buffer[:offset]  # Drop consumed frames in one go
+        return messages
+
+
+class Connection:
+    """
+        This class sends and receives framed messages over a blocking socket.
+
+        Received bytes are read with recv_into() into one preallocated buffer that is reused for the whole connection,
+        and frames are decoded in place, so the only copy made of a message is the payload handed to the caller.
+        Every frame is sent with a single sendmsg() call that gathers the header and the payload without joining
+        them.
+
+        Attributes:
+            sock (socket.socket): The connected socket.
+            buffer (bytearray): Bytes received from the peer, reused for every message.
+            view (memoryview): View of the buffer, so recv_into() and slicing never copy it.
+            start (int): Offset of the first byte in the buffer that has not been decoded yet.
+            end (int): Offset just past the last byte received.
+            pending (deque): Messages already decoded but not yet returned by receive().
+            metrics (Metrics): Counts messages and bytes and times sends, None to skip instrumentation.
+
+        Methods:
+            send(msg_type: int, text: str): Sends a text message.
+            send_move(index: int, status: int): Sends a binary move.
+            send_instructions(size: int, win_length: int): Starts a game on a size x size board.
+            send_payload(msg_type: int, payload: bytes): Sends a message with an already encoded payload.
+            receive() -> tuple: Returns the next (msg_type, payload) message, or (None, b'') if the peer disconnected.
+    """
+
+    def __init__(self, sock, metrics=None, buffer_size=65536):
+        self.sock = sock
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.pending = deque()
+        self.metrics = metrics
+
+    def send(self, msg_type, text=''):
+        """Sends a text message to the peer."""
+        self.send_payload(msg_type, text.encode())
+
+    def send_move(self, index, status):
+        """Sends a move to the peer."""
+        self.send_payload(MSG_MOVE, encode_move(index, status))
+
+    def send_instructions(self, size, win_length):
+        """Tells the peer a game has started."""
+        self.send_payload(MSG_INSTRUCTIONS, encode_instructions(size, win_length))
+
+    def send_payload(self, msg_type, payload=b''):
+        """Sends a message with an already encoded payload, without copying the payload into a frame."""
+        if len(payload) > MAX_PAYLOAD_SIZE:
+            raise ProtocolError(f"Payload of {len(payload)} bytes is too large")
+        self.write((HEADER.pack(len(payload), msg_type), payload))
+
+    def write(self, buffers):
+        """Writes the buffers of one message to the socket in order, with as few sendmsg() calls as it allows."""
+        start = time.perf_counter()
+        if hasattr(self.sock, 'sendmsg'):
+            views = deque(memoryview(data) for data in buffers if data)
+            byte_count = sum(view.nbytes for view in views)
+            while views:
+                sent = self.sock.sendmsg(views)
+                # Drop the buffers that were sent whole, and skip the sent part of the next one
+                while views and sent >= views[0].nbytes:
+                    sent -= views.popleft().nbytes
+                if sent:
+                    views[0] = views[0][sent:]
+        else:  # No scatter/gather sends on this platform
+            data = b''.join(buffers)
+            byte_count = len(data)
+            self.sock.sendall(data)
+        if self.metrics is not None:
+            self.metrics.observe('sendmsg', time.perf_counter() - start)
+            self.metrics.increment('bytes_out', byte_count)
+            self.metrics.increment('messages_out')
+
+    def receive(self):
+        """
+        Waits for the next whole message from the peer.
+
+        Returns:
+            tuple: The (msg_type, payload) of the message, or (None, b'') if the peer disconnected. Text payloads
+            are left as bytes for the caller to decode.
+        """
+        while not self.pending:
+            if self.end == len(self.buffer):
+                self.compact()
+            received = self.sock.recv_into(self.view[self.end:])
+            if not received:
+                return None, b''
+            self.end += received
+            message_count = self.decode_frames()
+            if self.metrics is not None:
+                self.metrics.increment('bytes_in', received)
+                self.metrics.increment('messages_in', message_count)
+        return self.pending.popleft()
+
+    def decode_frames(self):
+        """
+        Decodes every whole frame in the receive buffer straight from the buffer, into the pending messages.
+
+        Returns:
+            int: The number of frames decoded.
+        """
+        buffer, view, pending = self.buffer, self.view, self.pending
+        start, end = self.start, self.end
+        message_count = 0
+        while end - start >= HEADER.size:
+            length, msg_type = HEADER.unpack_from(buffer, start)
+            if length > MAX_PAYLOAD_SIZE:
+                raise ProtocolError(f"Frame of {length} bytes is too large")
+            frame_end = start + HEADER.size + length
+            if frame_end > end:
+                break  # Wait for the rest of the frame
+            pending.append((msg_type, bytes(view[start + HEADER.size:frame_end])))
+            start = frame_end
+            message_count += 1
+
+        if start == end:
+            self.start = self.end = 0  # Buffer fully decoded, start over at the beginning
+        else:
+            self.start = start
+            self.reserve(HEADER.size + length if end - start >= HEADER.size else HEADER.size)
+        return message_count
+
+    def compact(self):
+        """Moves the bytes that have not been decoded yet to the start of the buffer, to make room after them."""
+        pending = self.end - self.start
+        self.view[:pending] = self.view[self.start:self.end]
+        self.start, self.end = 0, pending
+
+    def reserve(self, frame_size):
+        """Grows the buffer if a frame is larger than the whole buffer."""
+        if frame_size <= len(self.buffer):
+            return
+        self.compact()
+        self.view.release()  # A bytearray cannot be resized while a memoryview of it exists
+        self.buffer.extend(bytes(frame_size - len(self.buffer)))
+        self.view = memoryview(self.buffer)
@@ -0,0 +1,233 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the SelfPlay class, which plays many games of Tic-Tac-Toe at once for measuring
+# engine throughput and generating game records. All games of a batch are stored in one NumPy array of shape
+# (games, cells), where empty cells are 0, 'X' is 1 and 'O' is 2, and every turn is played in all of them at once.
+#
+# Win and draw detection follow the same rules as TicTacToe.check_winner() and TicTacToe.check_draw(): a player wins
+# with win_length marks in a row, and a game is a draw when every cell is marked without a winner.
+#
+# Run with --benchmark to compare the batched games against the same number of games played one TicTacToe at a time.
+# This script needs NumPy (pip install numpy).
+
+import argparse
+import random
+import time
+import numpy as np
+from tictactoe import TicTacToe, winning_lines
+
+EMPTY = 0
+X = 1
+O = 2
+
+# Values of SelfPlay.results
+ONGOING = 0
+X_WON = 1
+O_WON = 2
+DRAW = 3
+
+
+def random_policy(boards, player, rng):
+    """
+    Picks a random empty cell in every board.
+
+    Parameters:
+        boards (np.ndarray): The (games, cells) boards of the games still being played.
+        player (int): X or O, the player to move.
+        rng (np.random.Generator): The random number generator to use.
+
+    Returns:
+        np.ndarray: The cell to mark in each board.
+    """
+    scores = rng.random(boards.shape)
+    scores[boards != EMPTY] = -1.0  # Never pick a marked cell
+    return scores.argmax(axis=1)
+
+
+def ai_policy(ai):
+    """
+    Returns a policy that plays the AIPlayer's move in every board. Only works on the classic 3x3 board.
+
+    Parameters:
+        ai (AIPlayer): The AI to look moves up in.
+
+    Returns:
+        function: The policy.
+    """
+    table = np.frombuffer(ai.table, dtype=np.uint8)
+    powers = 3 ** np.arange(9)
+
+    def policy(boards, player, rng):
+        # Cell values already match the base 3 digits used to number the AI's table
+        return table[boards.astype(np.int64) @ powers] & 0x0F
+
+    return policy
+
+
+class SelfPlay:
+    """
+        This class plays a batch of tic-tac-toe games at once.
+
+        Attributes:
+            games (int): The number of games in the batch.
+            size (int): The number of rows and columns of the board.
+            win_length (int): How many marks in a row win a game.
+            lines (np.ndarray): The (lines, win_length) cell indexes of every winning line.
+            boards (np.ndarray): The (games, cells) boards of the batch.
+            results (np.ndarray): The ONGOING, X_WON, O_WON or DRAW result of each game.
+            moves (np.ndarray): The (games, cells) cells marked in each game, in order, -1 after the game ended.
+            move_count (int): The number of moves played across all games.
+
+        Methods:
+            play(x_policy, o_policy) -> np.ndarray: Plays every game to the end and returns the results.
+            check_winner(boards: np.ndarray, player: int) -> np.ndarray: Checks which boards the player has won.
+            check_draw(boards: np.ndarray) -> np.ndarray: Checks which boards are full.
+    """
+
+    def __init__(self, games, size=3, win_length=3, seed=None):
+        self.games = games
+        self.size = size
+        self.win_length = win_length
+        self.rng = np.random.default_rng(seed)
+
+        masks = sorted({mask for lines in winning_lines(size, win_length) for mask in lines})
+        self.lines = np.array([[i for i in range(size * size) if mask >> i & 1] for mask in masks], dtype=np.intp)
+        self.boards = np.zeros((games, size * size), dtype=np.int8)
+        self.results = np.full(games, ONGOING, dtype=np.int8)
+        self.moves = np.full((games, size * size), -1, dtype=np.int16)
+        self.move_count = 0
+
+    def check_winner(self, boards, player):
+        """
+        Checks which boards a player has won.
+
+        Parameters:
+            boards (np.ndarray): The (games, cells) boards to check.
+            player (int): X or O.
+
+        Returns:
+            np.ndarray: True for each board where the player has win_length in a row.
+        """
+        return (boards[:, self.lines] == player).all(axis=2).any(axis=1)
+
+    def check_draw(self, boards):
+        """
+        Checks which boards are full.
+
+        Parameters:
+            boards (np.ndarray): The (games, cells) boards to check.
+
+        Returns:
+            np.ndarray: True for each board with no empty cell left.
+        """
+        return (boards != EMPTY).all(axis=1)
+
+    def play(self, x_policy=random_policy, o_policy=random_policy):
+        """
+        Plays every game of the batch to the end.
+
+        Parameters:
+            x_policy (function): Chooses the moves of 'X', called as policy(boards, player, rng).
+            o_policy (function): Chooses the moves of 'O'.
+
+        Returns:
+            np.ndarray: The result of each game.
+        """
+        player, policy = X, x_policy
+        for turn in range(self.size * self.size):
+            active = np.flatnonzero(self.results == ONGOING)
+            if active.size == 0:
+                break
+
+            boards = self.boards[active]
+            cells = policy(boards, player, self.rng)
+            boards[np.arange(active.size), cells] = player
+            self.boards[active] = boards
+            self.moves[active, turn] = cells
+            self.move_count += active.size
+
+            # A game only ends on the mover's turn, so only the mover can have won
+            won = self.check_winner(boards, player)
+            self.results[active[won]] = X_WON if player == X else O_WON
+            drawn = ~won & self.check_draw(boards)
+            self.results[active[drawn]] = DRAW
+
+            player, policy = (O, o_policy) if player == X else (X, x_policy)
+        return self.results
+
+
+def play_one_at_a_time(games, size=3, win_length=3, seed=None):
+    """
+    Plays random games one TicTacToe instance at a time, as the baseline for the benchmark.
+
+    Parameters:
+        games (int): The number of games to play.
+        size (int): The number of rows and columns of the board.
+        win_length (int): How many marks in a row win a game.
+        seed (int): Seed for the random number generator.
+
+    Returns:
+        int: The number of moves played.
+    """
+    rng = random.Random(seed)
+    move_count = 0
+    for _ in range(games):
+        tictactoe = TicTacToe(size, win_length)
+        cells = list(range(size * size))
+        rng.shuffle(cells)
+        player = 'X'
+        for index in cells:
+            tictactoe.move(index, player)
+            move_count += 1
+            if tictactoe.check_winner(player) or tictactoe.check_draw():
+                break
+            player = 'O' if player == 'X' else 'X'
+    return move_count
+
+
+def report(name, games, move_count, seconds):
+    """Prints the throughput of a run."""
+    print(f"{name}: {games} games, {move_count} moves in {seconds:.3f}s = "
+          f"{games / seconds:,.0f} games/sec, {move_count / seconds:,.0f} moves/sec")
+
+
+def benchmark(games, size=3, win_length=3, seed=None):
+    """Times random self-play batched against one TicTacToe at a time, and prints the results."""
+    start = time.perf_counter()
+    selfplay = SelfPlay(games, size, win_length, seed)
+    selfplay.play()
+    report("batched", games, selfplay.move_count, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    move_count = play_one_at_a_time(games, size, win_length, seed)
+    report("one at a time", games, move_count, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many games of tic-tac-toe at once.")
+    parser.add_argument('--games', type=int, default=100000, help="number of games to play")
+    parser.add_argument('--size', type=int, default=3, help="number of rows and columns of the board")
+    parser.add_argument('--win-length', type=int, default=3, help="how many marks in a row win a game")
+    parser.add_argument('--policy', choices=('random', 'ai'), default='random', help="how both players move")
+    parser.add_argument('--seed', type=int, default=None, help="seed for the random number generator")
+    parser.add_argument('--benchmark', action='store_true', help="compare against one TicTacToe at a time")
+    args = parser.parse_args()
+    if args.policy == 'ai' and (args.size, args.win_length) != (3, 3):
+        parser.error("the AI only plays on the classic 3x3 board")
+
+    if args.benchmark:
+        benchmark(args.games, args.size, args.win_length, args.seed)
+    else:
+        if args.policy == 'ai':
+            from ai import AIPlayer
+            policy = ai_policy(AIPlayer())
+        else:
+            policy = random_policy
+        start = time.perf_counter()
+        selfplay = SelfPlay(args.games, args.size, args.win_length, args.seed)
+        results = selfplay.play(policy, policy)
+        report("batched", args.games, selfplay.move_count, time.perf_counter() - start)
+        print(f"X won: {np.count_nonzero(results == X_WON)}, O won: {np.count_nonzero(results == O_WON)}, "
+              f"draw: {np.count_nonzero(results == DRAW)}")
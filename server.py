@@ -14,7 +14,13 @@
 
 import socket
 import json
+import sys
+import time
 from tictactoe import TicTacToe, instructions
+from metrics import Metrics
+from transposition import TranspositionCache
+from protocol import (Connection, ProtocolError, decode_move, decode_instructions, MSG_TEXT, MSG_QUIT, MSG_INSTRUCTIONS,
+                      MSG_STATE, MSG_MOVE, PLAY_REQUEST, STATUS_ONGOING, STATUS_WIN, STATUS_DRAW)
 
 
 class Server:
@@ -28,17 +34,41 @@ class Server:
          tictactoe (TicTacToe): The current tic-tac-toe game.
          tictactoe_player_server (str): The symbol representing the server player in the game.
          tictactoe_player_client (str): The symbol representing the client player in the game.
+         board_size (int): The number of rows and columns of the board in games this server starts.
+         win_length (int): How many marks in a row win games this server starts.
+         ai (AIPlayer): Plays the server's moves when running in AI mode, None when a person plays them.
+         metrics (Metrics): Counts messages, errors and invalid moves and times the hot path.
+         positions (TranspositionCache): Caches the rendered string of positions seen before.
+         idle_timeout (float): Seconds to wait for the client before closing the connection, None to wait forever.
 
      Methods:
          start_server(): Starts the server and begins listening for connections.
+         replay_move(index: int, move_status: int) -> str: Replays a move received from the client.
+         game_state(game_status: str) -> dict: Returns the full game state sent when the client's board is out of sync.
      """
 
-    def __init__(self, host='localhost', port=2000):
+    def __init__(self, host='localhost', port=2000, ai=False, board_size=3, win_length=3, metrics_port=None,
+                 idle_timeout=None):
         self.host = host
         self.port = port
         self.tictactoe = None  # Store tictactoe object
         self.tictactoe_player_server = None  # Either x or o
         self.tictactoe_player_client = None  # Either x or o
+        self.board_size = board_size
+        self.win_length = win_length
+        if ai and (board_size, win_length) != (3, 3):
+            raise ValueError("The AI only plays on the classic 3x3 board")
+        self.ai = None
+        if ai:
+            from ai import AIPlayer  # Loads the AI's tables, only servers that play against the AI need them
+            self.ai = AIPlayer()
+        self.metrics = Metrics()
+        self.positions = TranspositionCache()
+        self.idle_timeout = idle_timeout
+        for name in ('render_hits', 'render_misses'):
+            self.metrics.gauge(f'position_cache_{name}', lambda name=name: getattr(self.positions, name))
+        if metrics_port is not None:
+            self.metrics.start_http_server(host, metrics_port)
 
     def start_server(self):
         try:
@@ -53,6 +83,9 @@ class Server:
                     # Accept connections from client
                     connection_socket, client_address = server_socket.accept()
                     with connection_socket:
+                        connection_socket.settimeout(self.idle_timeout)
+                        connection = Connection(connection_socket, self.metrics)
+                        self.metrics.increment('connections')
                         messages = [
                             f"Connected by {client_address}",
                             "Wait for message from client and input prompt before entering message... ",
@@ -64,105 +97,186 @@ class Server:
 
                         while True:
                             # Receive response from client and print
-                            client_response = connection_socket.recv(1024).decode()
+                            try:
+                                msg_type, payload = connection.receive()
+                            except socket.timeout:
+                                self.metrics.increment('idle_disconnects')
+                                print(f"Client was idle for {self.idle_timeout:g} seconds, closing the connection")
+                                break
                             # If no response from client, then invalid
-                            if not client_response:
+                            if msg_type is None:
                                 print("Received empty response from client")
                                 break
                             # If client decides to quit, also quit
-                            if client_response == "/q":
+                            if msg_type == MSG_QUIT:
                                 print("Client has decided to quit the program.")
                                 running = False
                                 break  # Break the loop and end the connection
+                            if msg_type == MSG_INSTRUCTIONS:
+                                # The side that sends the instructions chooses the board
+                                board_size, win_length, client_response = decode_instructions(payload)
+                            else:
+                                client_response = payload.decode() if msg_type != MSG_MOVE else ''
 
-                            # If playing tictactoe, deal with JSON response object and update variables
-                            if game_mode:
-                                try:
-                                    response_object = json.loads(client_response)
-                                    self.tictactoe.board = response_object["board"]
-                                    self.tictactoe_player_client = response_object["client character"]
-                                    self.tictactoe_player_server = response_object["server character"]
-                                    game_status = response_object["game status"]
-                                    print(self.tictactoe)
-
-                                    # Handle game status
-                                    if game_status != "ongoing":
-                                        game_mode = False
-                                        print(game_status)
+                            # Client lost track of the board, or sent something other than a move: the server's
+                            # board is authoritative, send the full game state and wait for the client to move
+                            if game_mode and msg_type not in (MSG_MOVE, MSG_TEXT):
+                                connection.send(MSG_STATE, json.dumps(self.game_state("ongoing")))
+                                continue
 
-                                except json.JSONDecodeError:
-                                    print("Received non-JSON response while in game mode")
+                            # If playing tictactoe, replay the client's move on our own board
+                            if game_mode and msg_type == MSG_MOVE:
+                                index, move_status = decode_move(payload)
+                                game_status = self.replay_move(index, move_status)
+                                if game_status is None:
+                                    self.metrics.increment('invalid_moves')
+                                    print("Received a move that does not match the board, sending the game state")
+                                    connection.send(MSG_STATE, json.dumps(self.game_state("ongoing")))
+                                    continue
+                                print(self.positions.render(self.tictactoe))
+
+                                # Handle game status
+                                if game_status != "ongoing":
+                                    game_mode = False
+                                    print(game_status)
+
+                            # Client left the game and sent a message instead of a move
+                            elif game_mode and msg_type == MSG_TEXT:
+                                print(client_response)
+                                game_mode = False
                             else:
                                 # Display Client Response
                                 print(client_response)
 
                             # If the server initialized the game and client responded with instructions,
                             # server starts move
-                            if client_response == instructions():
+                            if msg_type == MSG_INSTRUCTIONS:
                                 game_mode = True
-                                self.tictactoe = TicTacToe()  # create store tictactoe object
+                                self.metrics.increment('games_started')
+                                self.tictactoe = TicTacToe(board_size, win_length)  # create store tictactoe object
                                 self.tictactoe_player_server = "X"
                                 self.tictactoe_player_client = "O"
 
-                            # If playing tictactoe, make a move and send JSON object
+                            # If playing tictactoe, make a move and send it to the client
                             if game_mode:
                                 valid_move = False
                                 while not valid_move:
-                                    server_input = input("Make your move >")
+                                    if self.ai:
+                                        server_input = str(self.ai.choose_move(self.tictactoe))
+                                        print(f"AI moves to {server_input}")
+                                    else:
+                                        server_input = input("Make your move >")
                                     if server_input == "/q":
                                         print("Server has decided to quit the game.")
                                         game_mode = False
                                         break
-                                    valid_move = self.tictactoe.move(int(server_input), self.tictactoe_player_server)
+                                    index = int(server_input)
+                                    start = time.perf_counter()
+                                    valid_move = self.tictactoe.move(index, self.tictactoe_player_server)
+                                    self.metrics.observe('move', time.perf_counter() - start)
                                     if not valid_move:
                                         print("Invalid move. Please try again.")
 
-                                print(str(self.tictactoe))
+                                if not valid_move:
+                                    connection.send(MSG_TEXT, "Server has decided to quit the game.")
+                                    continue
 
-                                game_status = "ongoing"
+                                print(self.positions.render(self.tictactoe))
+
+                                move_status = STATUS_ONGOING
                                 # Check for winner or draw after the server's move
                                 if self.tictactoe.check_winner(self.tictactoe_player_server):
                                     print("Server won the game!")
-                                    game_status = "Server won"
+                                    move_status = STATUS_WIN
                                     game_mode = False
                                 elif self.tictactoe.check_draw():
                                     print("The game is a draw!")
-                                    game_status = "draw"
+                                    move_status = STATUS_DRAW
                                     game_mode = False
 
-                                tictactoe_data = {
-                                    "server character": self.tictactoe_player_server,
-                                    "client character": self.tictactoe_player_client,
-                                    "board": self.tictactoe.board,
-                                    "game status": game_status
-                                }
-                                json_tictactoe_data = json.dumps(tictactoe_data)
-                                connection_socket.sendall(json_tictactoe_data.encode())
+                                connection.send_move(index, move_status)
 
                             # Initialize game
-                            elif client_response == 'play tictactoe':
+                            elif msg_type == MSG_TEXT and payload == PLAY_REQUEST:
                                 print("initializing Tic-Tac-Toe from client request")
                                 game_mode = True  # Set game_mode flag
-                                self.tictactoe = TicTacToe()
-                                tictactoe_instructions = instructions()
-                                print(tictactoe_instructions)
-                                connection_socket.sendall(tictactoe_instructions.encode())
+                                self.metrics.increment('games_started')
+                                self.tictactoe = TicTacToe(self.board_size, self.win_length)
+                                self.tictactoe_player_server = "O"
+                                self.tictactoe_player_client = "X"
+                                print(instructions(self.board_size, self.win_length))
+                                connection.send_instructions(self.board_size, self.win_length)
 
                             # Normal Messages
                             else:
                                 # Reply to client
+                                if self.ai:
+                                    connection.send(MSG_TEXT, "Type 'play tictactoe' to play against the AI")
+                                    continue
                                 server_input = input('Enter Input >')
                                 if server_input == "/q":
                                     print("Server has decided to quit the program.")
-                                    connection_socket.sendall("/q".encode())  # Inform client about termination
+                                    connection.send(MSG_QUIT)  # Inform client about termination
                                     running = False
                                     break  # Break the loop and end the connection
-                                connection_socket.sendall(server_input.encode())
+                                connection.send(MSG_TEXT, server_input)
 
+        except ProtocolError as e:
+            self.metrics.increment('decode_errors')
+            print(f"Received invalid data from client: {e}")
         except Exception as e:
-            print(f"An error occurred: {e}")
+            self.metrics.increment('errors')
+            print(f"An error occurred: {type(e).__name__}: {e}")
+
+    def replay_move(self, index, move_status):
+        """
+        Replays a move received from the client on the server's own board.
+
+        Parameters:
+            index (int): The index of the cell the client marked.
+            move_status (int): The game status the client reported after its move.
+
+        Returns:
+            str: The game status after the move, or None if the move is invalid or the reported status is wrong.
+        """
+        if not 0 <= index < self.tictactoe.cell_count:
+            return None
+        start = time.perf_counter()
+        valid_move = self.tictactoe.move(index, self.tictactoe_player_client)
+        self.metrics.observe('move', time.perf_counter() - start)
+        if not valid_move:
+            return None
+
+        if self.tictactoe.check_winner(self.tictactoe_player_client):
+            game_status, expected_status = "Client won", STATUS_WIN
+        elif self.tictactoe.check_draw():
+            game_status, expected_status = "draw", STATUS_DRAW
+        else:
+            game_status, expected_status = "ongoing", STATUS_ONGOING
+        if move_status != expected_status:
+            # Reported status disagrees with the board, undo the move so the client can resend it
+            self.tictactoe.board = [' ' if i == index else cell for i, cell in enumerate(self.tictactoe.board)]
+            return None
+        return game_status
+
+    def game_state(self, game_status):
+        """
+        Returns the full game state, sent to the client when it asks to resync or sends a move that does not apply.
+
+        Parameters:
+            game_status (str): The current status of the game.
+
+        Returns:
+            dict: The game state as a JSON serializable object.
+        """
+        return {
+            "server character": self.tictactoe_player_server,
+            "client character": self.tictactoe_player_client,
+            "board": self.tictactoe.board,
+            "game status": game_status
+        }
 
 
 if __name__ == "__main__":
-    server = Server()
+    server = Server(ai='--ai' in sys.argv, metrics_port=9100 if '--metrics' in sys.argv else None)
     server.start_server()
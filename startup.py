@@ -0,0 +1,100 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script measures how long the entry points take to start. Bots and server workers are often
+# short-lived processes, so the time spent importing modules before the first message is sent adds up.
+#
+# Each entry point is imported in a fresh interpreter started with python -X importtime, which reports the time spent
+# importing every module. The best of several runs is kept, along with the wall-clock time of the whole process and
+# the modules that took longest to import. The script fails if an entry point imports one of the LAZY_MODULES, which
+# are only needed by optional features and must be imported when those features are used, or if it takes longer to
+# import than the --max-ms budget. For example:
+#
+#     python startup.py --runs 10 --max-ms 50 client server
+
+import argparse
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = ('client', 'server', 'async_server', 'launcher', 'loadtest')
+
+# Modules of optional features: the AI's tables, NumPy self-play, the metrics HTTP endpoint and session profiling
+LAZY_MODULES = ('ai', 'selfplay', 'numpy', 'http.server', 'cProfile')
+
+
+def import_times(module):
+    """
+    Imports a module in a fresh interpreter and reads the import times it reports.
+
+    Parameters:
+        module (str): The module to import.
+
+    Returns:
+        tuple: The wall-clock seconds the interpreter ran for, and a dict mapping every imported module to its
+            (self, cumulative) import time in microseconds.
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    wall_time = time.perf_counter() - start
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_time), int(cumulative))
+    return wall_time, times
+
+
+def measure(module, runs=5):
+    """
+    Measures the startup of an entry point, keeping the best of several runs.
+
+    Parameters:
+        module (str): The module to import.
+        runs (int): The number of fresh interpreters to start.
+
+    Returns:
+        tuple: The best wall-clock seconds, the best import time of the module in microseconds, and the import times
+            of the run with the best import time.
+    """
+    best_wall_time, best_import_time, best_times = None, None, None
+    for _ in range(runs):
+        wall_time, times = import_times(module)
+        import_time = times[module][1]
+        if best_wall_time is None or wall_time < best_wall_time:
+            best_wall_time = wall_time
+        if best_import_time is None or import_time < best_import_time:
+            best_import_time, best_times = import_time, times
+    return best_wall_time, best_import_time, best_times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the startup time of the entry points.")
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS, help="entry points to measure")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters started per entry point")
+    parser.add_argument('--max-ms', type=float, default=None, help="fail if an import takes longer, in milliseconds")
+    parser.add_argument('--top', type=int, default=5, help="number of slowest imports listed per entry point")
+    args = parser.parse_args()
+
+    baseline_wall_time, _ = import_times('sys')
+    print(f"Interpreter startup: {baseline_wall_time * 1000:.1f} ms")
+    failures = []
+    for module in args.modules:
+        wall_time, import_time, times = measure(module, args.runs)
+        print(f"{module}: imported in {import_time / 1000:.1f} ms, process ran for {wall_time * 1000:.1f} ms")
+        slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:args.top]
+        for name, (self_time, cumulative) in slowest:
+            print(f"    {name}: {self_time / 1000:.1f} ms ({cumulative / 1000:.1f} ms with its imports)")
+
+        loaded = [name for name in LAZY_MODULES if name in times and name != module]
+        if loaded:
+            failures.append(f"{module} imports {', '.join(loaded)} on startup")
+        if args.max_ms is not None and import_time / 1000 > args.max_ms:
+            failures.append(f"{module} takes {import_time / 1000:.1f} ms to import, over {args.max_ms:g} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,42 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: Tests for the offline solver of every reachable position.
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis import analyze, read_analysis
+
+
+class AnalyzeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def analyze(self, name, size, win_length):
+        path = os.path.join(self.directory.name, name)
+        count = analyze(path, size, win_length, workers=2)
+        _, _, columns = read_analysis(path)
+        self.assertEqual(len(columns['value']), count)
+        return count
+
+    def test_classic_board(self):
+        self.assertEqual(self.analyze('classic.ttta', 3, 3), 765)
+
+    def test_analyses_in_one_process_are_independent(self):
+        # The memo of the first analysis must not leak into the second, here or in the forked workers
+        self.assertEqual(self.analyze('first.ttta', 3, 3), 765)
+        self.assertEqual(self.analyze('second.ttta', 3, 2), 186)
+        self.assertEqual(self.analyze('third.ttta', 3, 3), 765)
+
+
+if __name__ == "__main__":
+    unittest.main()
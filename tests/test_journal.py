@@ -0,0 +1,57 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: Tests for the game journal and the AsyncServer's recovery of a journal left behind by a crash.
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_server import AsyncServer
+from journal import JournalReader, JournalWriter, RECORD, KIND_START, KIND_MOVE, KIND_END, RESULT_X_WON
+
+
+class TornTailTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'games.journal')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_restart_after_torn_record(self):
+        # A crash leaves a game without its END record and a partly written record at the end of the file
+        writer = JournalWriter(self.path)
+        writer.start(1, 3, 3)
+        writer.move(1, 4, 'X')
+        writer.close()
+        with open(self.path, 'ab') as journal_file:
+            journal_file.write(b'\xff' * 5)
+
+        server = AsyncServer(journal_path=self.path)
+        server.open_journal()
+        self.assertEqual(os.path.getsize(self.path) % RECORD.size, 0)
+        session_id = server.new_session_id()
+        server.journal.start(session_id, 3, 3)
+        server.journal.move(session_id, 0, 'X')
+        server.journal.end(session_id, RESULT_X_WON)
+        server.journal.close()
+        server.journal_executor.shutdown()
+
+        reader = JournalReader(self.path)
+        records = list(reader.records())
+        statistics = reader.statistics()
+        reader.close()
+        self.assertEqual([(record[0], record[2]) for record in records],
+                         [(1, KIND_START), (1, KIND_MOVE), (1, KIND_END),
+                          (2, KIND_START), (2, KIND_MOVE), (2, KIND_END)])
+        self.assertEqual(statistics["unfinished"], 0)
+        self.assertEqual(statistics["results"], {"aborted": 1, "X won": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: Tests that framed messages written to a socket in chunks of any size are reassembled exactly and in
+# order, by the FrameDecoder and by the Connection.
+
+import os
+import random
+import socket
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from protocol import Connection, FrameDecoder, MSG_MOVE, MSG_QUIT, MSG_STATE, MSG_TEXT, encode_frame, encode_move
+
+BUFFER_SIZE = 16  # Receive buffer of the Connection, smaller than most frames
+
+
+class FramingTest(unittest.TestCase):
+    def setUp(self):
+        self.random = random.Random(372)
+        self.sender, self.receiver = socket.socketpair()
+        # Empty payloads, payloads that straddle the buffer and frames many times larger than it
+        self.messages = [(MSG_TEXT, b'play tictactoe'), (MSG_QUIT, b''), (MSG_MOVE, encode_move(4, 0))]
+        for _ in range(200):
+            size = self.random.choice((0, 1, BUFFER_SIZE - 5, BUFFER_SIZE, 100, 5000))
+            self.messages.append((self.random.choice((MSG_TEXT, MSG_STATE, MSG_MOVE)), self.random.randbytes(size)))
+        self.messages.append((MSG_STATE, self.random.randbytes(200000)))
+        self.messages.append((MSG_TEXT, b'last'))
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+
+    def send_in_chunks(self):
+        """Writes every frame to the socket from a thread, cut into chunks of random sizes, then closes it."""
+        stream = b''.join(encode_frame(msg_type, payload) for msg_type, payload in self.messages)
+        chunk_sizes = []
+        offset = 0
+        while offset < len(stream):
+            chunk_sizes.append(self.random.choice((1, 2, 3, 5, 7, 64, 1000, 70000)))
+            offset += chunk_sizes[-1]
+
+        def send():
+            offset = 0
+            for size in chunk_sizes:
+                self.sender.sendall(stream[offset:offset + size])
+                offset += size
+            self.sender.shutdown(socket.SHUT_WR)
+
+        thread = threading.Thread(target=send)
+        thread.start()
+        return thread
+
+    def test_frame_decoder(self):
+        thread = self.send_in_chunks()
+        decoder = FrameDecoder()
+        received = []
+        while True:
+            data = self.receiver.recv(self.random.choice((1, 3, 9, 100, 4096)))
+            if not data:
+                break
+            received.extend(decoder.feed(data))
+        thread.join()
+        self.assertEqual(received, self.messages)
+        self.assertEqual(decoder.buffer, b'')
+
+    def test_connection(self):
+        thread = self.send_in_chunks()
+        connection = Connection(self.receiver, buffer_size=BUFFER_SIZE)
+        received = []
+        while True:
+            msg_type, payload = connection.receive()
+            if msg_type is None:
+                break
+            received.append((msg_type, payload))
+        thread.join()
+        self.assertEqual(received, self.messages)
+
+    def test_connection_round_trip(self):
+        # Messages sent by one Connection are received whole by another, whatever the buffer size of the receiver
+        connection = Connection(self.sender)
+        peer = Connection(self.receiver, buffer_size=BUFFER_SIZE)
+
+        def send():
+            for msg_type, payload in self.messages:
+                connection.send_payload(msg_type, payload)
+
+        thread = threading.Thread(target=send)
+        thread.start()
+        received = [peer.receive() for _ in self.messages]
+        thread.join()
+        self.assertEqual(received, self.messages)
+
+
+if __name__ == '__main__':
+    unittest.main()
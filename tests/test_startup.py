@@ -0,0 +1,35 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: Tests that the entry points start without importing the modules of optional features.
+
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from startup import ENTRY_POINTS, LAZY_MODULES, import_times
+
+
+class LazyImportTest(unittest.TestCase):
+    def setUp(self):
+        # import_times() starts interpreters in the working directory, which must be the one holding the entry points
+        self.cwd = os.getcwd()
+        os.chdir(ROOT)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def test_entry_points_skip_lazy_modules(self):
+        for module in ENTRY_POINTS:
+            with self.subTest(module=module):
+                _, times = import_times(module)
+                self.assertIn(module, times)
+                self.assertEqual([name for name in LAZY_MODULES if name in times], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
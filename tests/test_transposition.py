@@ -0,0 +1,87 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: Tests for the canonical form of positions under symmetry and the bounded caches of transposition.py.
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tictactoe import TicTacToe
+from transposition import LRUCache, TranspositionCache, canonical_bits, symmetries
+
+
+def permute(bits, permutation):
+    """Moves every marked cell of a bitboard to the cell a symmetry sends it to."""
+    return sum(1 << permutation[index] for index in range(len(permutation)) if bits >> index & 1)
+
+
+class CanonicalBitsTest(unittest.TestCase):
+    def test_symmetric_positions_share_a_key(self):
+        # X in a corner and on an edge, O in the center and a corner, on the classic board and on a 4x4 board
+        for size, x_bits, o_bits in ((3, 0b000000011, 0b100010000), (4, 0b0000000000010011, 0b0100001000000000)):
+            key = canonical_bits(size, x_bits, o_bits)
+            for permutation in symmetries(size):
+                with self.subTest(size=size, permutation=permutation):
+                    self.assertEqual(canonical_bits(size, permute(x_bits, permutation), permute(o_bits, permutation)),
+                                     key)
+
+    def test_distinct_positions_have_distinct_keys(self):
+        # A corner and the center are not symmetric, nor is X in a corner with O next to it or across from it
+        self.assertNotEqual(canonical_bits(3, 1 << 0, 0), canonical_bits(3, 1 << 4, 0))
+        self.assertNotEqual(canonical_bits(3, 1 << 0, 1 << 1), canonical_bits(3, 1 << 0, 1 << 8))
+
+    def test_symmetry_classes_of_one_move(self):
+        # The 9 openings of the classic board come down to a corner, an edge and the center
+        self.assertEqual(len({canonical_bits(3, 1 << index, 0) for index in range(9)}), 3)
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)  # 'b' is now the least recently used
+        cache.put('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_put_refreshes_existing_key(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.put('a', 10)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 10)
+
+
+class TranspositionCacheTest(unittest.TestCase):
+    def test_render_hits_exact_position_only(self):
+        positions = TranspositionCache(max_entries=2)
+        tictactoe = TicTacToe()
+        tictactoe.move(0, 'X')
+        self.assertEqual(positions.render(tictactoe), str(tictactoe))
+        self.assertEqual(positions.render(tictactoe), str(tictactoe))
+
+        # A rotation of the board renders differently, so it misses
+        mirrored = TicTacToe()
+        mirrored.move(2, 'X')
+        self.assertEqual(positions.render(mirrored), str(mirrored))
+        self.assertEqual((positions.render_hits, positions.render_misses), (1, 2))
+
+        # A third position evicts the least recently used one
+        tictactoe.move(4, 'O')
+        positions.render(tictactoe)
+        positions.render(mirrored)
+        self.assertEqual((positions.render_hits, positions.render_misses), (2, 3))
+        self.assertEqual(len(positions.renderings), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
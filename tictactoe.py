@@ -10,27 +10,92 @@
 #
 # The game board can be checked for a winning condition using the check_winner() method, or for a draw using
 # the check_draw() method. The current state of the game board can also be output as a string using the __str__() method
+#
+# The board defaults to the classic 3x3 game, but any size x size board with a win_length in a row goal is supported,
+# such as 15x15 with 5 in a row. Winning is checked only along the lines through the player's last move, and a draw
+# is detected from a move counter, so the cost of a move does not grow with the size of the board.
+
 
+from functools import lru_cache
 
-def instructions():
-    list_of_instructions = """Game has started! You can make a move by entering the index of the square you want to move to.    
+
+@lru_cache(maxsize=None)
+def instructions(size=3, win_length=3):
+    """
+    Returns the instructions shown when a game starts, built once per board.
+
+    Parameters:
+        size (int): The number of rows and columns of the board.
+        win_length (int): How many marks in a row win the game.
+
+    Returns:
+        str: The instructions, with a map of the board's cell indexes.
+    """
+    width = len(str(size * size - 1))
+    rows = [
+        ' | '.join(str(index).rjust(width) for index in range(row * size, row * size + size))
+        for row in range(size)
+    ]
+    separator = '\n' + ' ' * 24 + '-' * len(rows[0]) + '\n'
+    board_map = separator.join(' ' * 24 + row for row in rows)
+
+    if size % 2:
+        example = f"if you want to mark the center square, you would type '{size * size // 2}'."
+    else:
+        example = "if you want to mark the top left square, you would type '0'."
+    list_of_instructions = f"""Game has started! You can make a move by entering the index of the square you want to move to.    
+Get {win_length} in a row to win.
 
 The board is structured as follows with corresponding index:    
-                        0 | 1 | 2
-                        ---------
-                        3 | 4 | 5
-                        ---------
-                        6 | 7 | 8   
-For example, if you want to mark the center square, you would type '4'.
+{board_map}   
+For example, {example}
     """
     return list_of_instructions
 
 
+@lru_cache(maxsize=None)
+def winning_lines(size, win_length):
+    """
+    Returns every line of win_length cells on a size x size board, grouped by the cells they pass through.
+
+    Parameters:
+        size (int): The number of rows and columns of the board.
+        win_length (int): How many marks in a row win the game.
+
+    Returns:
+        tuple: For each cell index, a tuple of bitmasks (bit i is cell i) of the lines that contain the cell.
+    """
+    if not 1 <= win_length <= size:
+        raise ValueError(f"win_length must be between 1 and {size}, got {win_length}")
+
+    lines_through = [[] for _ in range(size * size)]
+    for row in range(size):
+        for column in range(size):
+            # Lines starting at this cell going right, down, down-right and down-left
+            for row_step, column_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + row_step * (win_length - 1)
+                end_column = column + column_step * (win_length - 1)
+                if not (0 <= end_row < size and 0 <= end_column < size):
+                    continue
+                cells = [(row + row_step * i) * size + column + column_step * i for i in range(win_length)]
+                mask = sum(1 << cell for cell in cells)
+                for cell in cells:
+                    lines_through[cell].append(mask)
+    return tuple(tuple(lines) for lines in lines_through)
+
+
 class TicTacToe:
     """
         This class represents a Tic-Tac-Toe game.
 
+        The board is stored as two integers, one per player, where bit i is set if the player has marked cell i.
+
         Attributes:
+            size (int): The number of rows and columns of the board.
+            win_length (int): How many marks in a row win the game.
+            x_bits (int): The cells marked by 'X'.
+            o_bits (int): The cells marked by 'O'.
+            move_count (int): The number of marked cells.
             board (list): A list representing the game board. Empty cells are represented by ' '.
 
         Methods:
@@ -39,9 +104,41 @@ class TicTacToe:
             check_draw() -> bool: Checks if the game is a draw.
             __str__() -> str: Returns a string representation of the game board.
     """
-    def __init__(self):
-        """Initializes the TicTacToe class with an empty game board."""
-        self.board = [' ' for _ in range(9)]  # Start with empty board
+    __slots__ = ('size', 'win_length', 'cell_count', 'lines', 'x_bits', 'o_bits', 'move_count', 'x_last', 'o_last')
+
+    def __init__(self, size=3, win_length=3):
+        """
+        Initializes the TicTacToe class with an empty game board.
+
+        Parameters:
+            size (int): The number of rows and columns of the board.
+            win_length (int): How many marks in a row win the game.
+        """
+        self.size = size
+        self.win_length = win_length
+        self.cell_count = size * size
+        self.lines = winning_lines(size, win_length)  # Shared by every game of the same size
+        self.x_bits = 0  # Start with empty board
+        self.o_bits = 0
+        self.move_count = 0
+        self.x_last = None  # Last cell marked by each player, None if unknown
+        self.o_last = None
+
+    @property
+    def board(self):
+        """The game board as a list of cells, each 'X', 'O' or ' '."""
+        return [
+            'X' if self.x_bits >> i & 1 else 'O' if self.o_bits >> i & 1 else ' '
+            for i in range(self.cell_count)
+        ]
+
+    @board.setter
+    def board(self, board):
+        self.x_bits = sum(1 << i for i, cell in enumerate(board) if cell == 'X')
+        self.o_bits = sum(1 << i for i, cell in enumerate(board) if cell == 'O')
+        self.move_count = bin(self.x_bits | self.o_bits).count('1')
+        self.x_last = None  # Forces check_winner() to scan the whole board
+        self.o_last = None
 
     def move(self, index, player):
         """
@@ -54,32 +151,49 @@ class TicTacToe:
         Returns:
             bool: True if the move was valid, False otherwise.
         """
+        if not 0 <= index < self.cell_count:
+            raise IndexError("board index out of range")
+        bit = 1 << index
         # If spot is empty
-        if self.board[index] == ' ':
-            self.board[index] = player  # Make the move
-            return True     # Valid move
-        return False    # Invalid move
+        if (self.x_bits | self.o_bits) & bit:
+            return False    # Invalid move
+        if player == 'X':
+            self.x_bits |= bit  # Make the move
+            self.x_last = index
+        elif player == 'O':
+            self.o_bits |= bit
+            self.o_last = index
+        else:
+            raise ValueError(f"Unknown player: {player!r}")
+        self.move_count += 1
+        return True     # Valid move
 
     def check_winner(self, player):
         """
         Checks if a player has won the game.
 
+        Only the lines through the player's last move are checked, since a line completed earlier would already
+        have ended the game.
+
         Parameters:
             player (str): The player to check for a win.
 
         Returns:
             bool: True if the player has won, False otherwise.
         """
-        winning_combinations = [
-            [0, 1, 2], [3, 4, 5], [6, 7, 8],  # rows
-            [0, 3, 6], [1, 4, 7], [2, 5, 8],  # columns
-            [0, 4, 8], [2, 4, 6]  # diagonals
-        ]
-
-        for combination in winning_combinations:
-            if self.board[combination[0]] == self.board[combination[1]] == self.board[combination[2]] == player:
+        if player == 'X':
+            bits, last = self.x_bits, self.x_last
+        elif player == 'O':
+            bits, last = self.o_bits, self.o_last
+        else:
+            return False
+
+        if last is None:
+            # Board was replaced wholesale, check every line
+            return any(bits & mask == mask for lines in self.lines for mask in lines)
+        for mask in self.lines[last]:
+            if bits & mask == mask:
                 return True
-
         return False
 
     def check_draw(self):
@@ -89,7 +203,7 @@ class TicTacToe:
         Returns:
             bool: True if the game is a draw, False otherwise.
         """
-        return all(cell != ' ' for cell in self.board)
+        return self.move_count == self.cell_count
 
     def __str__(self):
         """
@@ -98,8 +212,10 @@ class TicTacToe:
         Returns:
             str: The game board as a string.
         """
+        board = self.board
+        size = self.size
+        separator = '-' * (4 * size - 3)
         return '\n'.join([
-            ' | '.join(self.board[i:i + 3]) + '\n' + '-' * 9
-            for i in range(0, 9, 3)
-        ])[:-9]  # Remove the last "---"
-
+            ' | '.join(board[i:i + size]) + '\n' + separator
+            for i in range(0, self.cell_count, size)
+        ])[:-len(separator)]  # Remove the last "---"
@@ -0,0 +1,97 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the TimerWheel class, which keeps the turn and idle timers of every connection on
+# the AsyncServer. A timer wheel is a ring of slots, one per tick: a timer due in n ticks goes into the slot n ticks
+# ahead of the current one, and every tick the wheel moves one slot forward and fires the timers in that slot.
+#
+# Scheduling and cancelling a timer are O(1), and a tick only looks at the timers of one slot, so the cost of a tick
+# does not grow with the number of connections. Most timers are cancelled long before they fire (the player moved in
+# time), which is the case the wheel makes cheapest. Timers are only as precise as the tick.
+
+
+class Timer:
+    """
+        This class is a timer scheduled on a TimerWheel.
+
+        Attributes:
+            slot (set): The slot of the wheel the timer is in, None once it has fired or been cancelled.
+            rounds (int): The number of full turns of the wheel left before the timer is due.
+            callback (function): Called with args when the timer fires.
+            args (tuple): Arguments of the callback.
+
+        Methods:
+            cancel(): Stops the timer from firing.
+    """
+    __slots__ = ('slot', 'rounds', 'callback', 'args')
+
+    def __init__(self, slot, rounds, callback, args):
+        self.slot = slot
+        self.rounds = rounds
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        """Stops the timer from firing. Does nothing if it already fired or was cancelled."""
+        if self.slot is not None:
+            self.slot.discard(self)
+            self.slot = None
+
+
+class TimerWheel:
+    """
+        This class schedules timers on a ring of slots advanced once per tick.
+
+        Attributes:
+            tick (float): Seconds per tick.
+            slots (list): The timers due in each slot.
+            current (int): The index of the slot of the current tick.
+
+        Methods:
+            schedule(delay: float, callback, *args) -> Timer: Schedules a callback to run after a delay.
+            advance(): Moves the wheel one tick forward and fires the timers that are due.
+    """
+
+    def __init__(self, tick=1.0, slot_count=512):
+        self.tick = tick
+        self.slots = [set() for _ in range(slot_count)]
+        self.current = 0
+
+    def __len__(self):
+        return sum(len(slot) for slot in self.slots)
+
+    def schedule(self, delay, callback, *args):
+        """
+        Schedules a callback to run after a delay.
+
+        Parameters:
+            delay (float): Seconds to wait, rounded up to a whole number of ticks.
+            callback (function): Called with args when the timer fires.
+
+        Returns:
+            Timer: The timer, which can be cancelled.
+        """
+        ticks = max(1, -int(-delay // self.tick))
+        rounds, offset = divmod(ticks, len(self.slots))
+        if offset == 0:
+            rounds, offset = rounds - 1, len(self.slots)  # A full turn lands back on the current slot
+        slot = self.slots[(self.current + offset) % len(self.slots)]
+        timer = Timer(slot, rounds, callback, args)
+        slot.add(timer)
+        return timer
+
+    def advance(self):
+        """Moves the wheel one tick forward and fires the timers that are due."""
+        self.current = (self.current + 1) % len(self.slots)
+        slot = self.slots[self.current]
+        due = []
+        for timer in slot:
+            if timer.rounds:
+                timer.rounds -= 1  # Only timers longer than a full turn of the wheel get here
+            else:
+                due.append(timer)
+        for timer in due:
+            slot.discard(timer)
+            timer.slot = None
+            timer.callback(*timer.args)
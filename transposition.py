@@ -0,0 +1,189 @@
+# Name: Trey Booritch
+# OSU Email: booritct@oregonstate.edu
+# Course: CS372 - Computer Networks
+# Due Date: June 6, 2023,
+# Description: This script contains the TranspositionCache class, which remembers the rendered string of board
+# positions that have been seen before, so positions that come up again and again across games are not re-rendered
+# every time. A position is keyed by its board size and the two bitboards of the TicTacToe class, and the cache is
+# bounded, evicting the least recently used position first.
+#
+# It also finds the canonical form of a position, the smallest of its 8 rotations and reflections, which the analysis
+# uses to solve each symmetry class of positions once.
+
+from collections import OrderedDict
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def symmetries(size):
+    """
+    Returns the 8 rotations and reflections of a board as cell permutations.
+
+    Parameters:
+        size (int): The number of rows and columns of the board.
+
+    Returns:
+        tuple: For each symmetry, a tuple giving the cell each cell is moved to.
+    """
+    last = size - 1
+    transforms = (
+        lambda row, col: (row, col),
+        lambda row, col: (col, last - row),
+        lambda row, col: (last - row, last - col),
+        lambda row, col: (last - col, row),
+        lambda row, col: (row, last - col),
+        lambda row, col: (last - row, col),
+        lambda row, col: (col, row),
+        lambda row, col: (last - col, last - row),
+    )
+    permutations = []
+    for transform in transforms:
+        permutation = []
+        for index in range(size * size):
+            row, col = transform(*divmod(index, size))
+            permutation.append(row * size + col)
+        permutations.append(tuple(permutation))
+    return tuple(permutations)
+
+
+@lru_cache(maxsize=None)
+def symmetry_tables(size):
+    """
+    Returns lookup tables that apply each symmetry to a bitboard one byte at a time.
+
+    Parameters:
+        size (int): The number of rows and columns of the board.
+
+    Returns:
+        tuple: For each symmetry, one 256 entry table per byte of the bitboard, mapping the byte's value to the bits
+            it is moved to.
+    """
+    cell_count = size * size
+    tables = []
+    for permutation in symmetries(size):
+        byte_tables = []
+        for offset in range(0, cell_count, 8):
+            table = []
+            for value in range(256):
+                bits = 0
+                for bit in range(8):
+                    if value >> bit & 1 and offset + bit < cell_count:
+                        bits |= 1 << permutation[offset + bit]
+                table.append(bits)
+            byte_tables.append(tuple(table))
+        tables.append(tuple(byte_tables))
+    return tuple(tables)
+
+
+def transform(bits, byte_tables):
+    """Applies a symmetry to a bitboard using its byte tables."""
+    transformed = 0
+    for table in byte_tables:
+        transformed |= table[bits & 0xFF]
+        bits >>= 8
+    return transformed
+
+
+def canonical_bits(size, x_bits, o_bits):
+    """
+    Returns the representative of a position's symmetry class.
+
+    Parameters:
+        size (int): The number of rows and columns of the board.
+        x_bits (int): The cells marked by 'X'.
+        o_bits (int): The cells marked by 'O'.
+
+    Returns:
+        tuple: The smallest (x_bits, o_bits) among the 8 symmetric images of the position.
+    """
+    return min((transform(x_bits, byte_tables), transform(o_bits, byte_tables))
+               for byte_tables in symmetry_tables(size))
+
+
+class LRUCache:
+    """
+        This class maps keys to values, evicting the least recently used key once it is full.
+
+        Attributes:
+            max_entries (int): The maximum number of keys kept.
+            entries (OrderedDict): The cached values, from least to most recently used.
+
+        Methods:
+            get(key) -> object: Returns the value of a key, or None if it is not cached.
+            put(key, value): Caches a value.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Returns the value of a key and marks it as recently used, or returns None if the key is not cached."""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Caches a value, evicting the least recently used key if the cache is full."""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class TranspositionCache:
+    """
+        This class caches the rendered string of board positions.
+
+        Attributes:
+            renderings (LRUCache): The rendered string of each position.
+            render_hits (int): Rendered strings found in the cache.
+            render_misses (int): Rendered strings built from scratch.
+
+        Methods:
+            render(tictactoe: TicTacToe) -> str: Returns the board as str(tictactoe) would.
+            stats() -> dict: Returns the hit and miss counts of the cache.
+    """
+
+    def __init__(self, max_entries=65536):
+        self.renderings = LRUCache(max_entries)
+        self.render_hits = 0
+        self.render_misses = 0
+
+    def render(self, tictactoe):
+        """
+        Renders a position, reusing the string built the last time it was seen.
+
+        Parameters:
+            tictactoe (TicTacToe): The position.
+
+        Returns:
+            str: The board, as str(tictactoe) would return it.
+        """
+        key = (tictactoe.size, tictactoe.x_bits, tictactoe.o_bits)
+        rendering = self.renderings.get(key)
+        if rendering is not None:
+            self.render_hits += 1
+            return rendering
+        self.render_misses += 1
+        rendering = str(tictactoe)
+        self.renderings.put(key, rendering)
+        return rendering
+
+    def stats(self):
+        """
+        Returns the hit and miss counts of the cache.
+
+        Returns:
+            dict: The counts, with the hit rate.
+        """
+        render_lookups = self.render_hits + self.render_misses
+        return {
+            "render_hits": self.render_hits,
+            "render_misses": self.render_misses,
+            "render_hit_rate": self.render_hits / render_lookups if render_lookups else 0.0,
+        }